@@ -0,0 +1,152 @@
+""" Benchmark of the auth hot path.
+
+Measures what requires_auth costs per request, from reading the
+Authorization header to the permission check, against a local stand-in
+of the JWKS endpoint and locally minted RS256 tokens.
+
+Usage:
+    python -m benchmarks.auth_benchmark
+    python -m benchmarks.auth_benchmark --save bench_auth.json
+    python -m benchmarks.auth_benchmark --baseline bench_auth.json
+"""
+import argparse
+import sys
+import time
+
+from flask import json
+
+from config_test import TestConfig
+from limbook_api import AuthError, create_app
+from limbook_api.v1.auth import requires_auth, jwks_store, \
+    verified_tokens, token_blacklist, blacklist_token
+from tests.base import JwksStubServer, generate_signing_key, mint_token
+
+KID = 'bench-key'
+
+
+@requires_auth('read:posts')
+def protected():
+    return 'ok'
+
+
+def reset_caches(keys=True, tokens=True):
+    if keys:
+        jwks_store.clear()
+    if tokens:
+        verified_tokens.clear()
+
+
+def scenarios(private_key):
+    """ name => (token, setup run before every measured call) """
+    allowed = mint_token(private_key, KID, permissions=['read:posts'])
+    denied = mint_token(private_key, KID, permissions=['read:comments'])
+    revoked = mint_token(
+        private_key, KID, permissions=['read:posts'], sub='auth0|revoked')
+
+    return {
+        'cold_keys': (allowed, lambda: reset_caches()),
+        'warm_keys': (allowed, lambda: reset_caches(keys=False)),
+        'cached_token': (allowed, lambda: None),
+        'permission_denied': (denied, lambda: None),
+        'blacklisted_token': (revoked, lambda: None),
+    }
+
+
+def run_scenario(app, token, setup, iterations):
+    headers = {'Authorization': 'Bearer ' + token}
+    timings = []
+
+    # warm up once so one-off costs don't skew the numbers
+    for i in range(0, iterations + 1):
+        setup()
+        with app.test_request_context('/', headers=headers):
+            started = time.perf_counter()
+            try:
+                protected()
+            except AuthError:
+                pass
+            timings.append(time.perf_counter() - started)
+
+    return summarize(timings[1:])
+
+
+def summarize(timings):
+    timings = sorted(timings)
+
+    def percentile(p):
+        return timings[min(len(timings) - 1, int(len(timings) * p))]
+
+    return {
+        'ops_per_sec': len(timings) / sum(timings),
+        'p50_ms': percentile(0.50) * 1000,
+        'p99_ms': percentile(0.99) * 1000,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """ Names of the scenarios slower than the baseline allows """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected and \
+                result['p50_ms'] > expected['p50_ms'] * (1 + tolerance):
+            regressions.append(name)
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--save', help='write results to this json file')
+    parser.add_argument(
+        '--baseline', help='fail if slower than results in this json file')
+    parser.add_argument(
+        '--tolerance', type=float, default=1.0,
+        help='allowed slowdown against the baseline, 1.0 = 100%%')
+    args = parser.parse_args(argv)
+
+    private_key, jwk = generate_signing_key(KID)
+    jwks_server = JwksStubServer(keys=[jwk]).start()
+
+    app = create_app(TestConfig)
+    app.config['JWKS_URL'] = jwks_server.url
+    # measure the rate limiter without ever running out of requests
+    app.config['RATE_LIMITS'] = {'default': (10 ** 9, 10 ** 9)}
+
+    results = {}
+    try:
+        with app.app_context():
+            for name, (token, setup) in scenarios(private_key).items():
+                reset_caches()
+                token_blacklist.clear()
+                if name == 'blacklisted_token':
+                    blacklist_token(token)
+                results[name] = run_scenario(
+                    app, token, setup, args.iterations)
+    finally:
+        jwks_server.stop()
+
+    print('{:<20}{:>14}{:>10}{:>10}'.format(
+        'scenario', 'ops/sec', 'p50 ms', 'p99 ms'))
+    for name, result in results.items():
+        print('{:<20}{:>14.0f}{:>10.3f}{:>10.3f}'.format(
+            name, result['ops_per_sec'], result['p50_ms'],
+            result['p99_ms']))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print('Slower than baseline: ' + ', '.join(regressions))
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+""" Benchmark of the response encoder.
+
+Measures how long jsonify takes to encode a page of 100 post summaries,
+each with images and a comment preview, with the stdlib encoder and
+with ApiJSONEncoder.
+
+Usage:
+    python -m benchmarks.json_benchmark
+    python -m benchmarks.json_benchmark --posts 500 --iterations 500
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+from flask import jsonify
+from flask.json import JSONEncoder
+
+from benchmarks.auth_benchmark import summarize
+from config_test import TestConfig
+from limbook_api import create_app
+from limbook_api.encoder import ApiJSONEncoder, orjson
+
+
+def post_page(size):
+    """ Post summaries shaped like the ones GET /posts returns """
+    created_on = datetime(2020, 5, 1, 12, 0, 0, 123456)
+
+    def image(image_id):
+        return {
+            'id': image_id,
+            'user_id': 'auth0|user',
+            'url': {
+                'thumb': 'thumb-' + str(image_id) + '.jpg',
+                'medium': 'medium-' + str(image_id) + '.jpg',
+                'large': 'large-' + str(image_id) + '.jpg'
+            },
+            'created_on': created_on,
+            'updated_on': created_on
+        }
+
+    def comment(comment_id, post_id):
+        return {
+            'id': comment_id,
+            'content': 'Comment ' + str(comment_id) + ' ' + 'lorem ' * 20,
+            'user_id': 'auth0|user',
+            'post_id': post_id,
+            'parent_id': None,
+            'created_on': created_on + timedelta(seconds=comment_id),
+            'updated_on': created_on + timedelta(seconds=comment_id)
+        }
+
+    return [{
+        'id': post_id,
+        'content': 'Post ' + str(post_id) + ' ' + 'lorem ipsum ' * 40,
+        'user_id': 'auth0|user',
+        'images': [image(post_id * 10 + i) for i in range(3)],
+        'react_count': post_id * 3,
+        'comment_count': post_id * 2,
+        'reacted': post_id % 2 == 0,
+        'comments': [comment(post_id * 10 + i, post_id) for i in range(3)]
+    } for post_id in range(1, size + 1)]
+
+
+def run_scenario(app, page, iterations):
+    timings = []
+    with app.test_request_context('/v1/posts?page=1'):
+        for i in range(0, iterations + 1):
+            started = time.perf_counter()
+            jsonify({'success': True, 'posts': page, 'total': len(page)})
+            timings.append(time.perf_counter() - started)
+
+    # the first call pays one-off costs
+    return summarize(timings[1:])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--posts', type=int, default=100)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    if orjson is None:
+        print('orjson is not installed, ApiJSONEncoder uses the stdlib')
+
+    app = create_app(TestConfig)
+    page = post_page(args.posts)
+
+    results = {}
+    for name, json_encoder in (
+            ('stdlib', JSONEncoder), ('api_encoder', ApiJSONEncoder)):
+        app.json_encoder = json_encoder
+        results[name] = run_scenario(app, page, args.iterations)
+
+    print('{:<20}{:>14}{:>10}{:>10}'.format(
+        'encoder', 'pages/sec', 'p50 ms', 'p99 ms'))
+    for name, result in results.items():
+        print('{:<20}{:>14.0f}{:>10.3f}{:>10.3f}'.format(
+            name, result['ops_per_sec'], result['p50_ms'],
+            result['p99_ms']))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
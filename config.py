@@ -15,9 +15,23 @@ class Config:
     # App secret
     SECRET_KEY = os.environ.get('SECRET_KEY')
 
+    # Number of proxies in front of the app, e.g. 1 behind the heroku
+    # router. Client addresses are read from their X-Forwarded-For headers.
+    TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))
+
     # Pagination
     PAGINATION = 10
 
+    # Unfiltered tables with more rows report an estimated total
+    # with ?total=estimate
+    TOTAL_ESTIMATE_MIN_ROWS = 100000
+
+    # Number of comments previewed with each post of a post list
+    COMMENT_PREVIEW_SIZE = 3
+
+    # Maximum number of items created by one bulk create request
+    BULK_CREATE_LIMIT = 100
+
     # Access token validity in seconds
     ACCESS_TOKEN_VALID_TIME = 10 * 60
 
@@ -37,6 +51,49 @@ class Config:
     ALGORITHMS = ['RS256']
     API_AUDIENCE = 'limbook-api-auth'
 
+    # Signing keys are fetched from the JWKS url and cached per process.
+    # When JWKS_URL is not set it is derived from AUTH0_DOMAIN.
+    JWKS_URL = os.environ.get('JWKS_URL')
+    JWKS_CACHE_TTL = 60 * 60
+    # Minimum seconds between refetches caused by an unknown key id
+    JWKS_MIN_REFETCH_INTERVAL = 30
+    JWKS_FETCH_TIMEOUT = 5
+    # Keep the keys fresh from a background thread in every worker
+    JWKS_BACKGROUND_REFRESH = True
+    JWKS_REFRESH_INTERVAL = 10 * 60
+    # Keys saved on disk so freshly started workers don't have to fetch.
+    # Keys in this file are trusted, point it to a directory only the app
+    # user can write to. Disabled when not set.
+    JWKS_SNAPSHOT_PATH = os.environ.get('JWKS_SNAPSHOT_PATH')
+    # Stop fetching for a while after this many failures in a row and
+    # keep serving the last known keys
+    JWKS_BREAKER_THRESHOLD = 3
+    JWKS_BREAKER_COOLDOWN = 30
+
+    # Max number of verified tokens whose claims are kept in memory
+    VERIFIED_TOKEN_CACHE_SIZE = 10000
+
+    # If you pick 'database', tokens are signed with SECRET_KEY
+    LOCAL_AUTH_ALGORITHM = 'HS256'
+
+    # -------------------------------------------
+    # Rate limiting
+    # -------------------------------------------
+    # Requests are limited per user and per permission required by the
+    # route. Each limit is (burst, requests refilled per second).
+    # Logins are limited per client address.
+    RATE_LIMIT_ENABLED = True
+    RATE_LIMITS = {
+        'default': (60, 10),
+        'auth:login': (10, 0.2),
+        'read:posts': (60, 10),
+        'create:posts': (10, 0.5),
+        'create:comments': (20, 1),
+        'create:images': (5, 0.2),
+    }
+    # Buckets kept per worker when redis is unavailable
+    RATE_LIMIT_LOCAL_MAX_BUCKETS = 10000
+
     # -------------------------------------------
     # Demo
     # -------------------------------------------
@@ -73,10 +130,22 @@ class Config:
     # -------------------------------------------
     # Flask-Caching
     # -------------------------------------------
-    CACHE_TYPE = "simple"
+    # Shared by every worker through redis when available
+    CACHE_TYPE = "redis" if os.environ.get('REDIS_URL') else "simple"
+    CACHE_REDIS_URL = os.environ.get('REDIS_URL')
 
     CACHE_DEFAULT_TIMEOUT = 300
 
+    # Cache the responses of list routes. Needs a cache shared by every
+    # worker, a write served by one worker would not reach the others
+    RESPONSE_CACHE_ENABLED = CACHE_TYPE == "redis"
+    RESPONSE_CACHE_TIMEOUT = 60
+
+    # Cache each formatted row of list routes. Keys include the version of
+    # the row, so a process local cache never serves stale rows either
+    FRAGMENT_CACHE_ENABLED = True
+    FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
     # -------------------------------------------
     # Database
     # -------------------------------------------
@@ -93,6 +162,21 @@ class Config:
     USE_REDIS = True
     REDIS_URL = os.environ.get('REDIS_URL')
 
+    # Revoked tokens are kept in redis and mirrored by a bloom filter in
+    # every worker, rebuilt from redis every BLACKLIST_BLOOM_REBUILD_INTERVAL
+    BLACKLIST_BLOOM_CAPACITY = 100000
+    BLACKLIST_BLOOM_ERROR_RATE = 0.001
+    BLACKLIST_BLOOM_REBUILD_INTERVAL = 60 * 60
+    # Seconds to wait before retrying when redis is unreachable
+    BLACKLIST_SYNC_RETRY_INTERVAL = 5
+
+    # Post search autocomplete indexes words of at least
+    # AUTOCOMPLETE_MIN_TERM_LENGTH characters by their prefixes of up to
+    # AUTOCOMPLETE_MAX_PREFIX characters
+    AUTOCOMPLETE_MIN_TERM_LENGTH = 2
+    AUTOCOMPLETE_MAX_PREFIX = 15
+    AUTOCOMPLETE_LIMIT = 10
+
     # -------------------------------------------
     # Image
     # -------------------------------------------
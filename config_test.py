@@ -4,6 +4,12 @@ from config import Config
 
 
 class TestConfig(Config):
+    # Test secret
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'test-secret-key')
+
+    # Cheap password hashing
+    BCRYPT_LOG_ROUNDS = 4
+
     # Test db
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         'TEST_DATABASE_URL', 'sqlite:///test.db?check_same_thread=False'
@@ -15,6 +21,15 @@ class TestConfig(Config):
     # Suppress mail sending
     MAIL_SUPPRESS_SEND = True
 
+    # Use in-process fallbacks instead of redis
+    USE_REDIS = False
+    CACHE_TYPE = 'simple'
+    RESPONSE_CACHE_ENABLED = True
+
+    # Signing keys are only fetched when tests ask for them
+    JWKS_BACKGROUND_REFRESH = False
+    JWKS_SNAPSHOT_PATH = None
+
     """Invalid token generated by unknown source for testing."""
     EXAMPLE_INVALID_TOKEN = 'Bearer eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ' \
                             '9.eyJzdWIiOiIxMjM0NTY3ODkwIiwibmFtZSI6Ikpv' \
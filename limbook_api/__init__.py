@@ -3,9 +3,11 @@ from flask_bcrypt import Bcrypt
 from flask_caching import Cache
 from flask_mail import Mail
 from rq import Queue
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from config import Config
-from limbook_api.db import setup_db
+from limbook_api.db import setup_db, reconcile_counts
+from limbook_api.encoder import ApiJSONEncoder
 from limbook_api.errors import AuthError, ImageUploadError
 from limbook_api.errors.error_handlers import register_error_handlers
 from limbook_api.v1 import register_v1_blueprints
@@ -23,6 +25,13 @@ def create_app(config_class=Config):
     # instantiate and configure flask app
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.json_encoder = ApiJSONEncoder
+
+    # read the client address behind trusted proxies
+    trusted_proxies = app.config.get('TRUSTED_PROXIES')
+    if trusted_proxies:
+        app.wsgi_app = ProxyFix(
+            app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies)
 
     # setup database related extensions
     setup_db(app)
@@ -39,9 +48,27 @@ def create_app(config_class=Config):
     # register blueprints
     register_v1_blueprints(app)
 
+    # warm up the auth signing keys
+    from limbook_api.v1.auth import jwks_store
+    jwks_store.init_app(app)
+
     # register error handlers
     register_error_handlers(app)
 
+    @app.cli.command('reconcile-counts')
+    def reconcile_counts_command():
+        """ Repair react, comment and reply counts that drifted """
+        print('Repaired ' + str(reconcile_counts()) + ' counts')
+
+    @app.cli.command('rebuild-autocomplete')
+    def rebuild_autocomplete_command():
+        """ Index every post for search autocomplete """
+        from sqlalchemy.orm import load_only
+        from limbook_api.v1.posts import Post, autocomplete_index
+        count = autocomplete_index.rebuild(
+            Post.query.options(load_only('id', 'content')).yield_per(1000))
+        print('Indexed ' + str(count) + ' posts')
+
     @app.route("/")
     def home():
         return render_template('home.html')
@@ -0,0 +1,92 @@
+from flask import current_app, abort
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import HTTP_STATUS_CODES
+
+from limbook_api.errors.rate_limit_error import RateLimitError
+from limbook_api.v1.auth.rate_limit import rate_limiter
+
+
+def bulk_items(data, key):
+    """ Items of a bulk create request
+
+        Parameters:
+            data (dict): Request body
+            key (string): Name of the list of items, e.g. "posts"
+
+        Returns:
+            items (list)
+
+        Raises:
+            HTTPException: 422 when there is no list of items, 413 when it
+                holds more than BULK_CREATE_LIMIT items
+    """
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        abort(422)
+
+    if len(items) > current_app.config.get('BULK_CREATE_LIMIT'):
+        abort(413)
+
+    return items
+
+
+def item_error(code):
+    """ Result of an item that was not created """
+    return {
+        'success': False,
+        'error': code,
+        'message': HTTP_STATUS_CODES[code]
+    }
+
+
+def validate_items(items, validate):
+    """ Run the validator of a single item create route on every item
+
+        Parameters:
+            items (list): Items of the request
+            validate (callable): e.g. validate_post_data, aborts when the
+                item is invalid
+
+        Returns:
+            results (list): An error for every invalid item, None for the
+                valid ones
+    """
+    results = []
+    for item in items:
+        try:
+            if not isinstance(item, dict):
+                abort(422)
+            validate(item)
+            results.append(None)
+        except HTTPException as e:
+            results.append(item_error(e.code))
+
+    return results
+
+
+def charge_items(results, user_id, permission):
+    """ Count every item to create against the user's rate limit
+
+        requires_auth already counted the request, which pays for the first
+        item. Once the user runs out of requests the remaining items are not
+        created.
+
+        Parameters:
+            results (list): Results of validate_items, updated in place
+            user_id (string): Id of the authenticated user
+            permission (string): Permission of the single item create route
+    """
+    if not current_app.config.get('RATE_LIMIT_ENABLED'):
+        return
+
+    valid = [index for index, result in enumerate(results) if result is None]
+    if len(valid) < 2:
+        return
+
+    try:
+        paid = 1 + rate_limiter.hit(user_id, permission, len(valid) - 1)
+    except RateLimitError:
+        paid = 1
+
+    for index in valid[paid:]:
+        results[index] = item_error(429)
@@ -1,12 +1,19 @@
+import sqlite3
+
 from flask_migrate import Migrate
 from flask_seeder import FlaskSeeder
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 db = SQLAlchemy()
 migrate = Migrate(compare_type=True)
 flask_seeder = FlaskSeeder()
 
+from limbook_api.db.unit_of_work import unit_of_work, \
+    after_commit  # noqa: E402
 from limbook_api.db.base_model import BaseDbModel  # noqa: E402
+from limbook_api.db.counters import reconcile_counts  # noqa: E402
 
 
 def setup_db(app):
@@ -21,6 +28,16 @@ def setup_db(app):
     flask_seeder.init_app(app, db)
 
 
+@event.listens_for(Engine, 'connect')
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """ sqlite ignores foreign keys, ON DELETE CASCADE included, unless
+    they are enabled on every connection """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
 def db_drop_and_create_all():
     """Drops the database tables and start fresh"""
     db.drop_all()
@@ -1,6 +1,10 @@
 from flask import json
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.declarative import declared_attr
+from sqlalchemy.orm import Session
 
 from limbook_api.db import db
+from limbook_api.db.unit_of_work import commit
 
 
 class BaseDbModel(db.Model):
@@ -12,14 +16,46 @@ class BaseDbModel(db.Model):
         db.DateTime, default=db.func.now(),
         onupdate=db.func.now()
     )
+    # incremented by every write of the row, unlike updated_on it changes
+    # even when the row is written twice within the same second
+    version = db.Column(
+        db.Integer, nullable=False, default=1, server_default='1'
+    )
+
+    # relationships to rows formatted with this one, they get a new
+    # version whenever this row is written, see touch_parents()
+    touches = ()
+
+    # counter columns of the rows referred by foreign keys, e.g.
+    # {'post_id': 'comment_count'}, see limbook_api.db.counters
+    counters = {}
+
+    @declared_attr
+    def __table_args__(cls):
+        # pages are ordered and found by (created_on, id)
+        return (
+            db.Index(
+                'ix_' + cls.__tablename__ + '_created_on_id',
+                'created_on', 'id'
+            ),
+        )
+
+    """
+    add()
+        stages a new model, it is inserted by the next commit
+    """
+
+    def add(self):
+        db.session.add(self)
+
     """
     insert()
         inserts a new image into a database
     """
 
     def insert(self):
-        db.session.add(self)
-        db.session.commit()
+        self.add()
+        commit()
 
     """
     update()
@@ -28,7 +64,16 @@ class BaseDbModel(db.Model):
     """
 
     def update(self):
-        db.session.commit()
+        commit()
+
+    """
+    stage_delete()
+        stages the deletion of a model, it is deleted by the next commit
+        the model must exist in the database
+    """
+
+    def stage_delete(self):
+        db.session.delete(self)
 
     """
     delete()
@@ -37,18 +82,112 @@ class BaseDbModel(db.Model):
     """
 
     def delete(self):
-        db.session.delete(self)
-        db.session.commit()
+        self.stage_delete()
+        commit()
+
+    """
+    serializers()
+        map field names to functions formatting them for the api
+    """
+
+    def serializers(self):
+        return {
+            'id': lambda: self.id
+        }
 
     """
     format()
-        format the data for the api
+        format the data for the api, limited to the given fields if any
     """
 
-    def format(self):
+    def format(self, fields=None):
+        return self.format_fields(self.serializers(), fields)
+
+    @staticmethod
+    def format_fields(serializers, fields=None):
+        """ Format only the requested fields
+
+        Fields that are not requested are never serialized, so the
+        relationships behind them are not loaded either.
+
+            Parameters:
+                serializers (dict): Functions formatting each field
+                fields (list|None): Names of fields to format, all when None
+
+            Returns:
+                data (dict)
+        """
         return {
-            'id': self.id
+            name: serialize() for name, serialize in serializers.items()
+            if fields is None or name in fields
         }
 
+    """
+    touch()
+        give the model a new version when the session is flushed, the
+        update sets a new updated_on as well
+    """
+
+    def touch(self):
+        self.version = type(self).version + 1
+
+    """
+    parents()
+        rows of the relationships listed in touches
+    """
+
+    def parents(self, session):
+        parents = []
+        for name in self.touches:
+            relationship = inspect(type(self)).relationships[name]
+            if relationship.secondary is not None:
+                parents.extend(getattr(self, name))
+                continue
+
+            # pending rows only know the foreign key of their parent
+            parent_id = getattr(self, next(iter(
+                relationship.local_columns)).key)
+            if parent_id is not None:
+                parents.append(
+                    session.query(relationship.mapper.class_).get(parent_id))
+
+        return [parent for parent in parents if parent is not None]
+
+    """
+    counted_rows()
+        number of rows a counter loses when this row is deleted, e.g. with
+        the rows the database deletes along with it
+    """
+
+    def counted_rows(self, column):
+        return 1
+
     def __repr__(self):
         return json.dumps(self.format())
+
+
+@event.listens_for(Session, 'before_flush')
+def touch_parents(session, flush_context, instances):
+    """ Bump the version of every written row and of its parents
+
+    ETags and cached fragments are keyed by version, so a post formatted
+    with its comments, reacts and images is formatted again once any of
+    them is created, changed or deleted.
+    """
+    dirty = [
+        instance for instance in session.dirty
+        if isinstance(instance, BaseDbModel) and session.is_modified(instance)
+    ]
+    for instance in dirty:
+        # changing only a collection, e.g. the images of a post, updates
+        # no column, so it gets a new version as well
+        if not inspect(instance).attrs.version.history.has_changes():
+            instance.touch()
+
+    for instance in list(session.new) + list(session.deleted) + dirty:
+        if not isinstance(instance, BaseDbModel):
+            continue
+
+        for parent in instance.parents(session):
+            if parent not in session.deleted:
+                parent.touch()
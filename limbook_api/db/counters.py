@@ -0,0 +1,125 @@
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from limbook_api.db import db
+from limbook_api.db.base_model import BaseDbModel
+
+
+def counter_parents(model, column):
+    """ Table whose rows are counted by the foreign key column of model """
+    return next(iter(model.__table__.c[column].foreign_keys)).column.table
+
+
+def add_counter_deltas(deltas, model, column, parent_id, delta):
+    """ Sum the change of a counter into deltas, keyed by
+    (table, counter column, parent id) """
+    key = (
+        counter_parents(model, column), model.counters[column], parent_id
+    )
+    deltas[key] = deltas.get(key, 0) + delta
+
+
+def update_counters(session, deltas):
+    """ Apply summed counter changes with one atomic UPDATE per parent
+
+    The counters are incremented by the database, so concurrent
+    transactions never overwrite each other's changes. The parents get a
+    new version, as they are formatted with their counters.
+    """
+    for (table, counter, parent_id), delta in deltas.items():
+        if delta:
+            session.execute(
+                table.update().where(table.c.id == parent_id)
+                .values({
+                    counter: table.c[counter] + delta,
+                    'version': table.c.version + 1
+                })
+            )
+
+
+def count_inserted_rows(model, rows):
+    """ Update the counters of rows inserted without the orm """
+    deltas = {}
+    for row in rows:
+        for column in model.counters:
+            if row.get(column) is not None:
+                add_counter_deltas(deltas, model, column, row[column], 1)
+
+    update_counters(db.session, deltas)
+
+
+@event.listens_for(Session, 'before_flush')
+def collect_counter_deltas(session, flush_context, instances):
+    """ Sum how the counters of parents change with the rows flushed
+
+    Deleted rows are counted before the flush, while the rows the
+    database deletes along with them still exist.
+    """
+    deltas = session.info['counter_deltas'] = {}
+    for instance in session.new:
+        if isinstance(instance, BaseDbModel):
+            for column in instance.counters:
+                parent_id = getattr(instance, column)
+                if parent_id is not None:
+                    add_counter_deltas(
+                        deltas, type(instance), column, parent_id, 1)
+
+    for instance in session.deleted:
+        if isinstance(instance, BaseDbModel):
+            for column in instance.counters:
+                parent_id = getattr(instance, column)
+                if parent_id is not None:
+                    add_counter_deltas(
+                        deltas, type(instance), column, parent_id,
+                        -instance.counted_rows(column))
+
+
+@event.listens_for(Session, 'after_flush')
+def apply_counter_deltas(session, flush_context):
+    deltas = session.info.pop('counter_deltas', {})
+    update_counters(session, deltas)
+
+    # counters loaded before the update are stale
+    session.info.setdefault('stale_counters', set()).update(
+        (table.name, counter, parent_id)
+        for table, counter, parent_id in deltas
+    )
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def expire_counters(session, flush_context):
+    stale = session.info.pop('stale_counters', set())
+    if not stale:
+        return
+
+    for instance in list(session.identity_map.values()):
+        for table_name, counter, parent_id in stale:
+            if getattr(instance, '__tablename__', None) == table_name \
+                    and instance.id == parent_id:
+                session.expire(instance, [counter])
+
+
+def reconcile_counts():
+    """ Repair the counters that drifted from the rows they count
+
+    Each counter is compared with a count of its rows by one UPDATE, only
+    the wrong ones are written.
+
+        Returns:
+            repaired (int): Number of counters that were wrong
+    """
+    repaired = 0
+    for model in BaseDbModel.__subclasses__():
+        for column, counter in model.counters.items():
+            parents = counter_parents(model, column)
+            children = model.__table__.alias()
+            count = select([func.count()])\
+                .where(children.c[column] == parents.c.id)\
+                .as_scalar()
+            repaired += db.session.execute(
+                parents.update().where(parents.c[counter] != count)
+                .values({counter: count, 'version': parents.c.version + 1})
+            ).rowcount
+
+    db.session.commit()
+    return repaired
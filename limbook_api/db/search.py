@@ -0,0 +1,63 @@
+from sqlalchemy import DDL, event, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from limbook_api.db import db
+
+# text search configuration used to build and query search vectors
+SEARCH_CONFIG = 'pg_catalog.english'
+
+
+def search_vector_column():
+    """ Column holding the tsvector of the "content" column
+
+    Postgres keeps it up to date with a trigger, see make_searchable().
+    Other databases get an unused text column. The column is deferred so
+    it is never loaded with the rows.
+    """
+    return db.deferred(db.Column(
+        db.Text().with_variant(TSVECTOR(), 'postgresql'),
+        nullable=True
+    ))
+
+
+def make_searchable(model):
+    """ Index the search vector of a model and maintain it on postgres
+
+        Parameters:
+            model (BaseDbModel): Model with "content" and "search_vector"
+    """
+    db.Index(
+        'ix_' + model.__tablename__ + '_search_vector',
+        model.search_vector,
+        postgresql_using='gin'
+    )
+    event.listen(model.__table__, 'after_create', DDL(
+        "CREATE TRIGGER %(table)s_search_vector_update "
+        "BEFORE INSERT OR UPDATE OF content ON %(fullname)s "
+        "FOR EACH ROW EXECUTE PROCEDURE tsvector_update_trigger("
+        "search_vector, '" + SEARCH_CONFIG + "', content)"
+    ).execute_if(dialect='postgresql'))
+
+
+def search(model, query, search_term):
+    """ Filter query to the rows whose content matches a search term
+
+    Postgres matches the search vector through its GIN index and puts
+    the most relevant rows first. Other databases, e.g. sqlite in tests,
+    fall back to a case insensitive substring match.
+
+        Parameters:
+            model (BaseDbModel): Model made searchable
+            query (Query): Query to filter
+            search_term (string): Words to search for
+
+        Returns:
+            query (Query)
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return query.filter(
+            model.content.ilike("%{}%".format(search_term)))
+
+    ts_query = func.plainto_tsquery(SEARCH_CONFIG, search_term)
+    return query.filter(model.search_vector.op('@@')(ts_query))\
+        .order_by(func.ts_rank(model.search_vector, ts_query).desc())
@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from limbook_api.db import db
+
+
+def in_unit_of_work():
+    return db.session.info.get('unit_of_work', 0) > 0
+
+
+def commit():
+    """ Commit the session, unless a unit of work commits it later """
+    if not in_unit_of_work():
+        db.session.commit()
+
+
+def after_commit(callback):
+    """ Run callback once the current transaction is committed
+
+    Work outside the database, e.g. removing files, waits for the rows it
+    belongs to. It is dropped when the transaction is rolled back.
+    Callbacks run inside the commit, so they must not use the session.
+    """
+    db.session.info.setdefault('after_commit', []).append(callback)
+
+
+@contextmanager
+def unit_of_work():
+    """ Commit everything written inside the block in one transaction
+
+    Models written inside the block, with add()/stage_delete() or with
+    insert(), update() and delete(), are committed once when the outermost
+    block exits and rolled back together when it raises.
+
+        Example:
+            with unit_of_work():
+                post.add()
+                post.images = images
+    """
+    depth = db.session.info.get('unit_of_work', 0)
+    db.session.info['unit_of_work'] = depth + 1
+    try:
+        yield db.session
+        if depth == 0:
+            db.session.commit()
+    except Exception:
+        if depth == 0:
+            db.session.rollback()
+        raise
+    finally:
+        db.session.info['unit_of_work'] = depth
+
+
+@event.listens_for(Session, 'after_commit')
+def run_after_commit(session):
+    for callback in session.info.pop('after_commit', []):
+        try:
+            callback()
+        except Exception:
+            # the transaction is committed already, keep the response
+            current_app.logger.exception('After commit callback failed')
+
+
+@event.listens_for(Session, 'after_rollback')
+def drop_after_commit(session):
+    session.info.pop('after_commit', None)
@@ -1,16 +1,279 @@
-from flask import request, current_app
+import base64
+import binascii
 
+from flask import request, current_app, json, abort
+from sqlalchemy import tuple_, literal, String, func, select, text
+from sqlalchemy.orm import load_only
 
-def filter_model(model, query, count_only=False):
+from limbook_api.db import db
+from limbook_api.db.counters import count_inserted_rows
+
+
+class Page(list):
+    """ Items of a page, the cursors of the pages around it and the total
+
+    Cursors are None when there is no page in that direction, total is
+    None when it was not requested.
+    """
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None,
+                 total=None):
+        super().__init__(items)
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+
+def encode_cursor(item):
+    """ Opaque cursor pointing at an item of a page """
+    return base64.urlsafe_b64encode(json.dumps(
+        [item.created_on.__str__(), item.id]
+    ).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """ Read the (created_on, id) position out of a cursor
+
+        Raises:
+            HTTPException: 400 when the cursor is malformed
+    """
+    try:
+        created_on, item_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_on), int(item_id)
+    except (binascii.Error, ValueError, TypeError):
+        abort(400)
+
+
+def requested_fields():
+    """ Fields requested with ?fields=id,content
+
+        Returns:
+            fields (list|None): Names of fields, None when all are requested
+    """
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+
+    return [field for field in fields.split(',') if field]
+
+
+def load_fields(model, query, fields=None, required=()):
+    """ Select only the columns behind the requested fields
+
+        Parameters:
+            model (BaseDbModel): Model queried
+            query (Query): Query to limit
+            fields (list|None): Names of fields, all columns when None
+            required (tuple): Columns needed whatever the fields
+
+        Returns:
+            query (Query)
+    """
+    if fields is None:
+        return query
+
+    columns = [
+        name for name in list(fields) + list(required)
+        if name in model.__table__.columns
+    ]
+    return query.options(load_only(*(columns or ['id'])))
+
+
+def estimate_total(model, query):
+    """ Row count of an unfiltered table from the planner statistics
+
+    Counting every row of a large table costs a full scan, the estimate
+    kept up to date by autovacuum costs a catalog lookup.
+
+        Returns:
+            total (int|None): None when the query is filtered, the database
+                keeps no statistics or the table is small enough to count
+    """
+    if query.whereclause is not None \
+            or db.engine.dialect.name != 'postgresql':
+        return None
+
+    total = db.session.execute(
+        text('SELECT reltuples::bigint FROM pg_class '
+             'WHERE oid = to_regclass(:table)'),
+        {'table': db.engine.dialect.identifier_preparer.quote(
+            model.__tablename__)}
+    ).scalar()
+    if total is None or total < current_app.config.get(
+            'TOTAL_ESTIMATE_MIN_ROWS'):
+        return None
+
+    return total
+
+
+def query_validator(query):
+    """ Number, latest id and sum of the versions of the rows of a query
+
+    An update raises the sum of versions, an insert raises the latest id
+    and a delete lowers the number of rows, so together they tell whether
+    a response built from the rows may have changed. Unlike updated_on,
+    versions change even when rows are written within the same second.
+
+        Returns:
+            validator (list): [count, latest id, sum of versions]
+    """
+    rows = query.order_by(None).statement.alias()
+    count, latest, versions = db.session.execute(
+        select([func.count(), func.max(rows.c.id), func.sum(rows.c.version)])
+        .select_from(rows)
+    ).first()
+    return [count, latest, versions]
+
+
+def row_validator(model, row_id):
+    """ Version of a single row, None when it does not exist """
+    return [
+        db.session.query(model.version).filter(model.id == row_id).scalar()
+    ]
+
+
+def filter_model(model, query, count_only=False, validator_only=False):
+    """ Get a page of the query results ordered by (created_on, id)
+
+    Pages are selected with ?page= by default. With ?after= or ?before=
+    set to a cursor of a previous response, the page is found with the
+    (created_on, id) index instead of skipping rows, so deep pages stay
+    as fast as the first one and concurrent inserts never shift them.
+
+    The total of the filtered rows is read in the same query as the page,
+    ?total=estimate takes it from the planner statistics for large
+    unfiltered tables and ?total=none skips it.
+
+        Parameters:
+            model (BaseDbModel): Model queried
+            query (Query): Filtered query
+            count_only (boolean): Count the results instead
+            validator_only (boolean): Get the query_validator() instead
+
+        Returns:
+            page (Page|int|list)
+    """
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get(
         'per_page', current_app.config.get('PAGINATION'), type=int)
     start = (page - 1) * per_page
+    after = request.args.get('after')
+    before = request.args.get('before')
+    total_mode = request.args.get('total', 'exact')
 
     # if count_only
     if count_only:
         return query.count()
 
-    query = query.order_by(model.created_on).limit(per_page).offset(start)
+    if validator_only:
+        return query_validator(query)
+
+    base_query = query
+    total = estimate_total(model, query) \
+        if total_mode == 'estimate' else None
+    count_column = None
+    if total is None and total_mode != 'none':
+        if after or before:
+            # the cursor filters rows out of the page query, count the
+            # filtered rows in a subquery of the same statement
+            count_column = select([func.count()]).select_from(
+                query.statement.alias()).as_scalar()
+        else:
+            count_column = func.count().over()
+
+    def fetch(page_query):
+        if count_column is None:
+            return page_query.all()
+
+        nonlocal total
+        rows = page_query.add_columns(count_column.label('total')).all()
+        if rows:
+            total = rows[0][-1]
+        elif not after and not before and not start:
+            total = 0
+        else:
+            total = base_query.count()
+
+        return [row[0] for row in rows]
+
+    # version keys the rows in the fragment cache
+    query = load_fields(
+        model, query, requested_fields(),
+        required=('created_on', 'version'))
+    position = tuple_(model.created_on, model.id)
+
+    # cursors point into the (created_on, id) order, any other ordering
+    # of the query, e.g. search relevance, applies to ?page= pages only
+    if after or before:
+        query = query.order_by(None)
+
+    def cursor_position(cursor):
+        # created_on is compared as text in the format the database
+        # returned it, so sqlite string timestamps compare correctly
+        created_on, item_id = decode_cursor(cursor)
+        return tuple_(literal(created_on, String), literal(item_id))
+
+    # one extra row tells whether there is a page after this one
+    if before:
+        items = fetch(query.filter(position < cursor_position(before))
+                      .order_by(model.created_on.desc(), model.id.desc())
+                      .limit(per_page + 1))
+        has_more = len(items) > per_page
+        items = items[:per_page][::-1]
+        return Page(
+            items,
+            next_cursor=encode_cursor(items[-1]) if items else None,
+            prev_cursor=encode_cursor(items[0]) if has_more else None,
+            total=total
+        )
+
+    query = query.order_by(model.created_on, model.id)
+    if after:
+        query = query.filter(position > cursor_position(after))
+    else:
+        query = query.offset(start)
+
+    items = fetch(query.limit(per_page + 1))
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    return Page(
+        items,
+        next_cursor=encode_cursor(items[-1]) if has_more else None,
+        prev_cursor=encode_cursor(items[0])
+        if items and (after or start) else None,
+        total=total
+    )
+
+
+def insert_rows(model, rows):
+    """ Insert many rows with one multi-row INSERT
+
+    Databases without INSERT ... RETURNING, e.g. sqlite, get one INSERT
+    per row through the ORM instead, as the ids could not be read back.
+    Either way the counters of the referred rows are updated.
+
+        Parameters:
+            model (BaseDbModel): Model of the rows
+            rows (list): Dicts of column values
+
+        Returns:
+            ids (list): Ids of the new rows, in the order of rows
+    """
+    if not rows:
+        return []
+
+    if not db.engine.dialect.implicit_returning:
+        items = [model(**row) for row in rows]
+        db.session.add_all(items)
+        db.session.flush()
+        return [item.id for item in items]
 
-    return query.all()
+    table = model.__table__
+    # postgres returns the rows of a multi-row VALUES in order
+    ids = [
+        row_id for row_id, in db.session.execute(
+            table.insert().values(rows).returning(table.c.id))
+    ]
+    count_inserted_rows(model, rows)
+    return ids
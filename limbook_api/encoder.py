@@ -0,0 +1,50 @@
+from datetime import date
+
+from flask.json import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class ApiJSONEncoder(JSONEncoder):
+    """ JSON encoder of every response, backed by orjson when installed.
+
+    orjson encodes a whole response in one native call, writes datetimes
+    as ISO 8601 itself, so models return them as they are, and leaves
+    non-ascii characters unescaped. The stdlib encoder is used when
+    orjson is missing, writing datetimes the same way.
+    """
+
+    def default(self, o):
+        if isinstance(o, date):
+            return o.isoformat()
+        # subclasses handed over by orjson, e.g. request.args
+        if isinstance(o, dict):
+            return dict(o.items())
+        if isinstance(o, (list, tuple)):
+            return list(o)
+        if isinstance(o, str):
+            return str(o)
+        if isinstance(o, int) and not isinstance(o, bool):
+            return int(o)
+
+        return super().default(o)
+
+    def encode(self, o):
+        if orjson is None:
+            return super().encode(o)
+
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_SUBCLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.indent:
+            option |= orjson.OPT_INDENT_2
+
+        try:
+            return orjson.dumps(o, default=self.default, option=option)\
+                .decode()
+        except TypeError:
+            # e.g. integers out of the 64 bit range orjson supports
+            return super().encode(o)
@@ -1,2 +1,4 @@
 from limbook_api.errors.auth_error import AuthError
 from limbook_api.errors.image_upload_error import ImageUploadError
+from limbook_api.errors.rate_limit_error import RateLimitError
+from limbook_api.errors.validation_error import ValidationError
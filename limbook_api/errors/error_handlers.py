@@ -1,6 +1,9 @@
+import math
+
 from flask import jsonify
 
 from limbook_api import AuthError, ImageUploadError
+from limbook_api.errors.rate_limit_error import RateLimitError
 from limbook_api.errors.validation_error import ValidationError
 
 
@@ -28,6 +31,17 @@ def register_error_handlers(app):
             "message": error.error.get('description')
         }), error.status_code
 
+    @app.errorhandler(RateLimitError)
+    def rate_limit_error(error):
+        return jsonify({
+            "success": False,
+            "error": error.status_code,
+            "error_code": error.error.get('code'),
+            "message": error.error.get('description')
+        }), error.status_code, {
+            'Retry-After': str(math.ceil(error.retry_after))
+        }
+
     @app.errorhandler(ValidationError)
     def validation_error(error):
         return jsonify({
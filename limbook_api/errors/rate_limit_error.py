@@ -0,0 +1,10 @@
+class RateLimitError(Exception):
+    """ RateLimitError Exception
+
+    A standardized way to communicate that a client sent too many requests
+    """
+
+    def __init__(self, error, status_code, retry_after):
+        self.error = error
+        self.status_code = status_code
+        self.retry_after = retry_after
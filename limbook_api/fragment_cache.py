@@ -0,0 +1,69 @@
+import hashlib
+
+from flask import current_app, json
+from redis.exceptions import RedisError
+
+from limbook_api import cache
+
+fragment_prefix = 'fragment:'
+
+
+def fragment_variant(*args):
+    """ Short digest of everything that changes how a row is formatted,
+    e.g. the requested fields """
+    return hashlib.sha256(json.dumps(args).encode()).hexdigest()[:16]
+
+
+def fragment_key(item, variant):
+    """ Key of the formatted row, a new version orphans the old one """
+    return fragment_prefix + ':'.join([
+        item.__tablename__, str(item.id), str(item.version), variant
+    ])
+
+
+def cached_fragments(items, variant, render):
+    """ Format rows through the fragment cache
+
+    Every fragment of the page is read with one multi-get. Only the rows
+    that missed are formatted, all at once, and written back with one
+    multi-set.
+
+        Parameters:
+            items (list): Rows with id and version loaded
+            variant (string): Digest of the format, see fragment_variant()
+            render (callable): Formats a list of rows, returns a list of
+                fragments in the same order
+
+        Returns:
+            fragments (list): In the order of items
+    """
+    if not items:
+        return []
+
+    if not current_app.config.get('FRAGMENT_CACHE_ENABLED'):
+        return render(items)
+
+    keys = [fragment_key(item, variant) for item in items]
+    try:
+        fragments = cache.get_many(*keys)
+    except RedisError:
+        current_app.logger.exception('Unable to read fragment cache')
+        return render(items)
+
+    missing = [
+        index for index, fragment in enumerate(fragments) if fragment is None
+    ]
+    if missing:
+        rendered = render([items[index] for index in missing])
+        for index, fragment in zip(missing, rendered):
+            fragments[index] = fragment
+
+        try:
+            cache.set_many(
+                {keys[index]: fragments[index] for index in missing},
+                timeout=current_app.config.get('FRAGMENT_CACHE_TIMEOUT')
+            )
+        except RedisError:
+            current_app.logger.exception('Unable to write fragment cache')
+
+    return fragments
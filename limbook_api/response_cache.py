@@ -0,0 +1,178 @@
+import hashlib
+import secrets
+from functools import wraps
+
+from flask import current_app, request, json, g
+from redis.exceptions import RedisError
+
+from limbook_api import cache
+from limbook_api.v1.auth.utils import auth_user_id
+
+generation_prefix = 'generation:'
+response_prefix = 'response:'
+# generations are random, one that expires is replaced by a new one
+generation_timeout = 24 * 60 * 60
+
+
+def get_generations(resources):
+    """ Current generation of each resource, created when missing """
+    keys = [generation_prefix + resource for resource in resources]
+    generations = cache.get_many(*keys)
+    for index, generation in enumerate(generations):
+        if generation is None:
+            # another worker may create it first, keep whichever won
+            cache.add(
+                keys[index], secrets.token_hex(8), timeout=generation_timeout)
+            generations[index] = cache.get(keys[index])
+
+    return generations
+
+
+def bump_generations(resources):
+    """ Move resources to a new generation, orphaning cached responses """
+    cache.set_many({
+        generation_prefix + resource: secrets.token_hex(8)
+        for resource in resources
+    }, timeout=generation_timeout)
+
+
+def normalized_args():
+    """ Query arguments sorted so their order does not matter """
+    return sorted(
+        (name, sorted(request.args.getlist(name)))
+        for name in request.args
+    )
+
+
+def response_cache_key(resources, user_id=None):
+    """ Key of the response to the current request
+
+    Made of the route, the query arguments, the generation of every
+    resource the response is built from, for user dependent responses the
+    user id, and the ETag of conditional responses, so rows changed
+    without going through the api are not served from the cache either.
+    """
+    source = json.dumps([
+        request.path, normalized_args(), get_generations(resources),
+        user_id, g.get('etag')
+    ])
+    return response_prefix + hashlib.sha256(source.encode()).hexdigest()
+
+
+def is_user_scoped(user_scoped):
+    return user_scoped() if callable(user_scoped) else user_scoped
+
+
+def conditional_response(validator, user_scoped=False):
+    """ Answer GET requests with 304 Not Modified when nothing changed
+
+    The ETag is made of the route, the query arguments, the user id for
+    user dependent responses and the validator, e.g. the number and the
+    versions of the rows behind the response. A request
+    whose If-None-Match matches it gets an empty 304 before the rows are
+    loaded or serialized. Place it under requires_auth and above
+    cached_response.
+
+        Parameters:
+            validator (callable): Called with the route arguments, returns
+                a json serializable summary of the rows behind the response
+            user_scoped (boolean|callable): Whether the response depends on
+                the auth user, or a function telling it for the request
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            source = json.dumps([
+                request.path, normalized_args(),
+                auth_user_id() if is_user_scoped(user_scoped) else None,
+                validator(*args, **kwargs)
+            ])
+            etag = g.etag = hashlib.sha256(source.encode()).hexdigest()
+
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def cached_response(*resources, user_scoped=False):
+    """ Cache the successful responses of a GET route
+
+    Place it under requires_auth, so permissions and rate limits are
+    checked before the cache is read.
+
+        Parameters:
+            resources (string): Resources the response is built from
+            user_scoped (boolean|callable): Whether the response depends on
+                the auth user, or a function telling it for the request
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('RESPONSE_CACHE_ENABLED'):
+                return f(*args, **kwargs)
+
+            try:
+                key = response_cache_key(
+                    resources,
+                    auth_user_id() if is_user_scoped(user_scoped) else None
+                )
+                cached = cache.get(key)
+            except RedisError:
+                current_app.logger.exception('Unable to read response cache')
+                return f(*args, **kwargs)
+
+            if cached is not None:
+                data, mimetype = cached
+                return current_app.response_class(data, mimetype=mimetype)
+
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                try:
+                    cache.set(
+                        key, (response.get_data(), response.mimetype),
+                        timeout=current_app.config.get(
+                            'RESPONSE_CACHE_TIMEOUT')
+                    )
+                except RedisError:
+                    current_app.logger.exception(
+                        'Unable to write response cache')
+
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def invalidates(*resources):
+    """ Bump the generation of resources once a write route ran
+
+    The generations are bumped even when the route fails, as it may have
+    written part of its changes.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            try:
+                return f(*args, **kwargs)
+            finally:
+                if current_app.config.get('RESPONSE_CACHE_ENABLED'):
+                    try:
+                        bump_generations(resources)
+                    except RedisError:
+                        current_app.logger.exception(
+                            'Unable to invalidate response cache')
+
+        return wrapper
+
+    return decorator
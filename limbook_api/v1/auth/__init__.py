@@ -1 +1,8 @@
+from limbook_api.v1.auth.model import *
+from limbook_api.v1.auth.blacklist import *
+from limbook_api.v1.auth.database_driver import *
+from limbook_api.v1.auth.jwks import *
+from limbook_api.v1.auth.permissions import *
+from limbook_api.v1.auth.rate_limit import *
+from limbook_api.v1.auth.token_cache import *
 from limbook_api.v1.auth.utils import *
@@ -0,0 +1,272 @@
+import hashlib
+import math
+import os
+import threading
+import time
+
+from flask import current_app
+from redis.exceptions import RedisError
+
+from limbook_api.v1.auth.token_cache import token_digest
+from worker import conn
+
+
+class BloomFilter:
+    """ Fixed size set membership filter without false negatives.
+
+    "item in bloom" is False only when the item was never added, so a
+    negative answer can be trusted without asking the source of truth.
+    """
+
+    def __init__(self, capacity, error_rate):
+        size = int(
+            -capacity * math.log(error_rate) / (math.log(2) ** 2)
+        ) or 1
+        self.size = size
+        self.hash_count = max(1, int(round(size / capacity * math.log(2))))
+        self.bits = bytearray((size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.sha256(item.encode()).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class TokenBlacklist:
+    """ Revoked tokens shared by every worker through Redis.
+
+    Each process keeps a bloom filter of revoked token digests, filled
+    from Redis on first use and kept up to date through pub/sub, so
+    checking a token that was never revoked costs no network call. Only
+    possible matches are confirmed with Redis. When Redis is disabled or
+    unreachable revocations are kept in process memory instead, and
+    Redis is left alone for BLACKLIST_SYNC_RETRY_INTERVAL seconds. Those
+    revocations are published once Redis is back.
+    """
+
+    key_prefix = 'blacklist:'
+    channel = 'blacklist'
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.bloom = None
+        self.synced_at = None
+        self.local = {}
+        self._building = None
+        self._pid = None
+        self._pubsub_thread = None
+        self._last_sync_attempt = 0
+        self._redis_retry_at = 0
+        self._lock = threading.Lock()
+
+    def use_redis(self):
+        return current_app.config.get('USE_REDIS')
+
+    def redis_available(self):
+        """ Whether Redis is used and did not just fail """
+        return self.use_redis() and time.time() >= self._redis_retry_at
+
+    def redis_failed(self, message):
+        current_app.logger.exception(message)
+        self._redis_retry_at = time.time() + current_app.config.get(
+            'BLACKLIST_SYNC_RETRY_INTERVAL')
+
+    def remember_locally(self, digest, timeout):
+        """ Keep a revocation in process memory.
+
+        Revocations share the same timeout, so the oldest ones expire
+        first and are dropped from the front of the dict.
+        """
+        now = time.time()
+        for oldest, expires_at in list(self.local.items()):
+            if expires_at > now:
+                break
+            del self.local[oldest]
+
+        self.local[digest] = now + timeout
+
+    def new_bloom(self):
+        return BloomFilter(
+            current_app.config.get('BLACKLIST_BLOOM_CAPACITY'),
+            current_app.config.get('BLACKLIST_BLOOM_ERROR_RATE')
+        )
+
+    def clear(self):
+        """ Forget the local state, e.g. between tests. """
+        with self._lock:
+            self.bloom = None
+            self.synced_at = None
+            self.local = {}
+            self._pid = None
+            self._redis_retry_at = 0
+
+    def revoke(self, token, timeout):
+        """ Blacklist a token for the given number of seconds. """
+        digest = token_digest(token)
+        self.ensure_synced()
+        self.bloom.add(digest)
+
+        if self.redis_available():
+            try:
+                pipe = self.connection.pipeline()
+                pipe.set(self.key_prefix + digest, 1, ex=timeout)
+                pipe.publish(self.channel, digest)
+                pipe.execute()
+                return
+            except RedisError:
+                self.redis_failed('Unable to blacklist token')
+
+        with self._lock:
+            self.remember_locally(digest, timeout)
+
+    def revoke_once(self, token, timeout):
+        """ Blacklist a token unless it already is, atomically.
+
+        Concurrent calls with the same token, even from different
+        workers, revoke it only once.
+
+            Returns:
+                revoked (bool): False when the token was already revoked
+        """
+        digest = token_digest(token)
+        self.ensure_synced()
+
+        with self._lock:
+            expires_at = self.local.get(digest)
+            if expires_at is not None and expires_at > time.time():
+                return False
+
+            if self.redis_available():
+                try:
+                    if not self.connection.set(
+                            self.key_prefix + digest, 1, ex=timeout, nx=True):
+                        return False
+                    self.bloom.add(digest)
+                    self.connection.publish(self.channel, digest)
+                    return True
+                except RedisError:
+                    self.redis_failed('Unable to blacklist token')
+
+            self.remember_locally(digest, timeout)
+
+        self.bloom.add(digest)
+        return True
+
+    def is_revoked(self, token):
+        """ Check if a token was blacklisted by any worker. """
+        digest = token_digest(token)
+        self.ensure_synced()
+
+        # without a synced filter every token is a possible match
+        synced = not self.use_redis() or self.synced_at is not None
+        if synced and digest not in self.bloom:
+            return False
+
+        expires_at = self.local.get(digest)
+        if expires_at is not None and expires_at > time.time():
+            return True
+
+        if self.redis_available():
+            try:
+                return bool(self.connection.exists(self.key_prefix + digest))
+            except RedisError:
+                self.redis_failed('Unable to check blacklist')
+
+        return False
+
+    def ensure_synced(self):
+        """ Build the bloom filter for this process and keep it in sync.
+
+        The filter is rebuilt from Redis after forking, when the pub/sub
+        listener died and every BLACKLIST_BLOOM_REBUILD_INTERVAL seconds
+        so expired revocations eventually drop out of it.
+        """
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self.bloom = self.new_bloom()
+                    self.synced_at = None
+                    self._pubsub_thread = None
+                    self._last_sync_attempt = 0
+
+        if not self.use_redis() or not self.needs_sync():
+            return
+
+        with self._lock:
+            if not self.needs_sync() or \
+                    time.time() - self._last_sync_attempt < \
+                    current_app.config.get('BLACKLIST_SYNC_RETRY_INTERVAL'):
+                return
+
+            self._last_sync_attempt = time.time()
+            try:
+                self.sync()
+                self._redis_retry_at = 0
+            except RedisError:
+                self.redis_failed('Unable to sync blacklist')
+                self.synced_at = None
+
+    def needs_sync(self):
+        return self.synced_at is None \
+            or not self._pubsub_thread.is_alive() \
+            or time.time() - self.synced_at >= current_app.config.get(
+                'BLACKLIST_BLOOM_REBUILD_INTERVAL')
+
+    def sync(self):
+        if self._pubsub_thread is None or not self._pubsub_thread.is_alive():
+            pubsub = self.connection.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: self.on_message})
+            self._pubsub_thread = pubsub.run_in_thread(
+                sleep_time=1, daemon=True)
+
+        # tokens revoked while redis was unreachable are published, so the
+        # other workers reject them as well
+        now = time.time()
+        replayed = {
+            digest: expires_at
+            for digest, expires_at in list(self.local.items())
+            if expires_at > now
+        }
+        if replayed:
+            pipe = self.connection.pipeline()
+            for digest, expires_at in replayed.items():
+                pipe.set(
+                    self.key_prefix + digest, 1,
+                    ex=max(1, int(math.ceil(expires_at - now))))
+                pipe.publish(self.channel, digest)
+            pipe.execute()
+        for digest in list(self.local):
+            if digest in replayed or self.local[digest] <= now:
+                self.local.pop(digest, None)
+
+        # revocations published while scanning go to both filters
+        self._building = self.new_bloom()
+        try:
+            for key in self.connection.scan_iter(self.key_prefix + '*'):
+                self._building.add(key.decode()[len(self.key_prefix):])
+            self.bloom = self._building
+        finally:
+            self._building = None
+
+        self.synced_at = time.time()
+
+    def on_message(self, message):
+        digest = message['data'].decode()
+        self.bloom.add(digest)
+        if self._building is not None:
+            self._building.add(digest)
+
+
+token_blacklist = TokenBlacklist(conn)
@@ -0,0 +1,231 @@
+import secrets
+import time
+
+from flask import current_app, abort
+from jose import jwt
+
+from limbook_api import AuthError, bcrypt
+from limbook_api.db import db
+from limbook_api.v1.auth.model import User, Role, Permission
+
+# checked when no user has the email, so unknown emails take as long as
+# wrong passwords, see authenticate()
+_dummy_password_hash = None
+
+
+def hash_password(password):
+    return bcrypt.generate_password_hash(password).decode()
+
+
+def check_password(password_hash, password):
+    return bcrypt.check_password_hash(password_hash, password)
+
+
+def dummy_password_hash():
+    global _dummy_password_hash
+    if _dummy_password_hash is None:
+        _dummy_password_hash = hash_password(secrets.token_hex(16))
+
+    return _dummy_password_hash
+
+
+def validate_login_data(data):
+    data = data if data else {}
+    # check if credentials are present
+    if not data.get('email') or not data.get('password'):
+        abort(422)
+
+
+def validate_refresh_data(data):
+    data = data if data else {}
+    # check if refresh token is present
+    if not data.get('refresh_token'):
+        abort(422)
+
+
+def authenticate(email, password):
+    """ Find the user with matching credentials.
+
+    The password is hashed even when no user has the email, so the
+    response time doesn't tell which emails are registered.
+
+        Raises:
+            AuthError: Email or password is invalid
+    """
+    user = User.query.filter(User.email == email).one_or_none()
+    password_hash = user.password if user else dummy_password_hash()
+    if not check_password(password_hash, password) or user is None:
+        raise AuthError({
+            'code': 'invalid_credentials',
+            'description': 'Invalid email or password'
+        }, 401)
+
+    return user
+
+
+def issue_token(user, token_type, valid_time):
+    now = int(time.time())
+    claims = {
+        'iss': current_app.config.get('APP_URL'),
+        'aud': current_app.config.get('API_AUDIENCE'),
+        'sub': user.auth_id,
+        'iat': now,
+        'exp': now + valid_time,
+        'jti': secrets.token_hex(8),
+        'type': token_type,
+    }
+    if token_type == 'access':
+        claims['permissions'] = [
+            permission.slug for permission in user.role.permissions
+        ]
+
+    return jwt.encode(
+        claims,
+        current_app.config.get('SECRET_KEY'),
+        algorithm=current_app.config.get('LOCAL_AUTH_ALGORITHM')
+    )
+
+
+def issue_tokens(user):
+    """ Issue a short-lived access token and a refresh token.
+
+        Returns:
+            tokens (dict)
+    """
+    access_token_valid_time = current_app.config.get(
+        'ACCESS_TOKEN_VALID_TIME')
+    return {
+        'access_token': issue_token(
+            user, 'access', access_token_valid_time),
+        'refresh_token': issue_token(
+            user, 'refresh',
+            current_app.config.get('REFRESH_TOKEN_VALID_TIME')
+        ),
+        'token_type': 'Bearer',
+        'expires_in': access_token_valid_time
+    }
+
+
+def verify_local_jwt(token, token_type='access'):
+    """ Verify a token issued by the "database" driver.
+
+    Tokens are signed with the app secret kept in memory, so verifying
+    them needs no network access.
+
+        Parameters:
+            token (string): Encoded token
+            token_type (string): "access" or "refresh"
+
+        Returns:
+            payload (dict): Claims decoded from token
+
+        Raises:
+            AuthError: Unable to verify jwt
+    """
+    try:
+        payload = jwt.decode(
+            token,
+            current_app.config.get('SECRET_KEY'),
+            algorithms=[current_app.config.get('LOCAL_AUTH_ALGORITHM')],
+            audience=current_app.config.get('API_AUDIENCE'),
+            issuer=current_app.config.get('APP_URL')
+        )
+
+    except jwt.ExpiredSignatureError:
+        raise AuthError({
+            'code': 'token_expired',
+            'description': 'Token expired'
+        }, 401)
+
+    except jwt.JWTClaimsError:
+        raise AuthError({
+            'code': 'invalid_claims',
+            'description': 'Incorrect claims. Please check '
+                           'the audience and issuer.'
+        }, 401)
+
+    except Exception:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Unable to parse authentication token.'
+        }, 401)
+
+    if payload.get('type') != token_type:
+        raise AuthError({
+            'code': 'invalid_token_type',
+            'description': 'Expected ' + token_type + ' token.'
+        }, 401)
+
+    return payload
+
+
+def user_from_payload(payload):
+    """ Get the user a token was issued to. """
+    driver, _, user_id = payload.get('sub', '').partition('|')
+    user = User.query.get(user_id) if driver == 'database' else None
+    if user is None:
+        raise AuthError({
+            'code': 'invalid_claims',
+            'description': 'Unknown user.'
+        }, 401)
+
+    return user
+
+
+def seed_roles_and_permissions():
+    """ Create roles and permissions listed in INITIAL_ROLES_AND_PERMISSIONS
+
+    Existing roles and permissions are kept, so it is safe to run again.
+    """
+    permissions = {
+        permission.slug: permission for permission in Permission.query.all()
+    }
+    roles = {role.slug: role for role in Role.query.all()}
+
+    for role_slug, permission_slugs in current_app.config.get(
+            'INITIAL_ROLES_AND_PERMISSIONS').items():
+        role = roles.get(role_slug)
+        if role is None:
+            role = Role(
+                slug=role_slug,
+                name=role_slug.replace('_', ' ').title(),
+                description=role_slug.replace('_', ' ').title()
+            )
+            db.session.add(role)
+            roles[role_slug] = role
+
+        for slug in permission_slugs:
+            permission = permissions.get(slug)
+            if permission is None:
+                permission = Permission(
+                    slug=slug, name=slug, description=slug
+                )
+                db.session.add(permission)
+                permissions[slug] = permission
+
+            if permission not in role.permissions:
+                role.permissions.append(permission)
+
+    db.session.commit()
+    return roles
+
+
+def generate_user(email=None, password=None, role='user'):
+    """Generates new user with random attributes for testing
+    """
+    roles = seed_roles_and_permissions()
+    user = User(**{
+        'first_name': 'User',
+        'last_name': secrets.token_hex(4),
+        'email':
+            email if email else secrets.token_hex(4) + '@example.com',
+        'email_verified': role != 'unverified_user',
+        'password': hash_password(
+            password if password
+            else current_app.config.get('DEMO_USER_PASSWORD')
+        ),
+        'role': roles[role]
+    })
+
+    user.insert()
+    return user
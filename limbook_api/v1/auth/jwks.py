@@ -0,0 +1,282 @@
+import os
+import stat
+import threading
+import time
+from urllib.request import urlopen
+
+from flask import current_app, json
+
+from limbook_api import AuthError
+
+
+def jwks_url():
+    """ Url of the JSON Web Key Set used to verify access tokens. """
+    url = current_app.config.get('JWKS_URL')
+    if url:
+        return url
+
+    auth0_domain = current_app.config.get('AUTH0_DOMAIN')
+    return f'https://{auth0_domain}/.well-known/jwks.json'
+
+
+def parse_jwks(jwks):
+    """ Index the signing keys of a JWKS document by their key id.
+
+        Parameters:
+            jwks (dict): JWKS document as published by the identity provider
+
+        Returns:
+            keys (dict): kid => rsa key usable by jose.jwt.decode
+    """
+    keys = {}
+    for key in jwks.get('keys', []):
+        if 'kid' not in key or key.get('kty') != 'RSA':
+            continue
+
+        keys[key['kid']] = {
+            'kty': key['kty'],
+            'kid': key['kid'],
+            'use': key.get('use', 'sig'),
+            'n': key['n'],
+            'e': key['e']
+        }
+
+    return keys
+
+
+def is_private_file(file_stat):
+    """ Whether a file is owned by the current user and nobody else can
+    write to it """
+    if file_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        return False
+
+    return not hasattr(os, 'getuid') or file_stat.st_uid == os.getuid()
+
+
+class JwksKeyStore:
+    """ Process-wide cache of the identity provider's signing keys.
+
+    Keys are fetched once and kept for JWKS_CACHE_TTL seconds. A token
+    signed with a kid we don't know yet triggers an early refresh so key
+    rotation keeps working, but such refreshes are rate limited by
+    JWKS_MIN_REFETCH_INTERVAL so bogus kids can't cause a fetch storm.
+
+    When JWKS_SNAPSHOT_PATH is set, every successful fetch is saved there
+    and loaded when the app is created so new workers start with warm
+    keys. Each worker can also keep the keys fresh from a background
+    thread. After JWKS_BREAKER_THRESHOLD failed fetches in a row the
+    identity provider is left alone for JWKS_BREAKER_COOLDOWN seconds,
+    and the last known good keys are served in the meantime.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.url = None
+        self.keys = {}
+        self.fetched_at = 0
+        self.last_fetch_attempt = 0
+        self.fetch_count = 0
+        self.failures = 0
+        self.breaker_open_until = 0
+        self._refresher = None
+        self._refresher_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """ Remember the app and load the keys saved by another worker. """
+        self.app = app
+        if app.config.get('AUTH_DRIVER') != 'auth0':
+            return
+
+        with app.app_context():
+            self.load_snapshot()
+
+    def clear(self):
+        """ Forget all cached keys. """
+        with self._lock:
+            self.url = None
+            self.keys = {}
+            self.fetched_at = 0
+            self.last_fetch_attempt = 0
+            self.failures = 0
+            self.breaker_open_until = 0
+
+    def get_key(self, kid):
+        """ Get the signing key for the given key id.
+
+            Parameters:
+                kid (string): Key id taken from the token header
+
+            Returns:
+                rsa_key (dict|None): Signing key or None if unknown
+
+            Raises:
+                AuthError: No keys are known and the JWKS is unreachable
+        """
+        if current_app.config.get('JWKS_BACKGROUND_REFRESH'):
+            self.ensure_refresher()
+
+        url = jwks_url()
+        now = time.time()
+
+        if url != self.url:
+            self.refresh(url)
+        elif now - self.fetched_at >= \
+                current_app.config.get('JWKS_CACHE_TTL'):
+            self.refresh(url)
+        elif kid not in self.keys and now - self.last_fetch_attempt >= \
+                current_app.config.get('JWKS_MIN_REFETCH_INTERVAL'):
+            self.refresh(url)
+
+        if url != self.url:
+            raise AuthError({
+                'code': 'jwks_unavailable',
+                'description': 'Unable to fetch the signing keys.'
+            }, 503)
+
+        return self.keys.get(kid)
+
+    def refresh(self, url):
+        """ Fetch the JWKS document and replace the cached keys.
+
+        Only one thread fetches at a time; threads that were waiting on
+        the lock reuse the result of the fetch that just finished.
+        Failures are logged and the known keys are kept.
+        """
+        attempt_started = time.time()
+        with self._lock:
+            if self.url == url and self.last_fetch_attempt >= \
+                    attempt_started:
+                return
+
+            if attempt_started < self.breaker_open_until:
+                return
+
+            self.last_fetch_attempt = time.time()
+            try:
+                jwks = self.fetch(url)
+            except Exception:
+                current_app.logger.exception('Unable to fetch JWKS')
+                self.failures += 1
+                if self.failures >= current_app.config.get(
+                        'JWKS_BREAKER_THRESHOLD'):
+                    self.breaker_open_until = time.time() + \
+                        current_app.config.get('JWKS_BREAKER_COOLDOWN')
+                return
+
+            self.url = url
+            self.keys = parse_jwks(jwks)
+            self.fetched_at = time.time()
+            self.failures = 0
+            self.breaker_open_until = 0
+
+        self.save_snapshot(url, jwks)
+
+    def fetch(self, url):
+        """ Download the JWKS document. """
+        self.fetch_count += 1
+        response = urlopen(
+            url, timeout=current_app.config.get('JWKS_FETCH_TIMEOUT')
+        )
+        return json.loads(response.read())
+
+    def save_snapshot(self, url, jwks):
+        path = current_app.config.get('JWKS_SNAPSHOT_PATH')
+        if not path:
+            return
+
+        try:
+            # write to a temp file first so readers never see half a file
+            tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+            fd = os.open(
+                tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({
+                    'url': url,
+                    'fetched_at': self.fetched_at,
+                    'jwks': jwks
+                }, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            current_app.logger.exception('Unable to save JWKS snapshot')
+
+    def load_snapshot(self):
+        """ Load the keys saved by another worker.
+
+        The keys of the snapshot are trusted, so it is ignored unless it
+        was written by the user running the app, nobody else can write to
+        it, it holds the keys of the current JWKS url and it is younger
+        than JWKS_CACHE_TTL.
+        """
+        path = current_app.config.get('JWKS_SNAPSHOT_PATH')
+        if not path or not os.path.isfile(path):
+            return
+
+        try:
+            with open(path) as f:
+                if not is_private_file(os.fstat(f.fileno())):
+                    current_app.logger.warning(
+                        'Ignoring JWKS snapshot %s, it is writable by '
+                        'other users', path)
+                    return
+
+                snapshot = json.load(f)
+            url = snapshot['url']
+            jwks = snapshot['jwks']
+            # a snapshot from the future would never be refreshed
+            fetched_at = min(float(snapshot['fetched_at']), time.time())
+        except (OSError, ValueError, TypeError, KeyError):
+            current_app.logger.exception('Unable to load JWKS snapshot')
+            return
+
+        if url != jwks_url() or time.time() - fetched_at >= \
+                current_app.config.get('JWKS_CACHE_TTL'):
+            return
+
+        with self._lock:
+            if fetched_at > self.fetched_at:
+                self.url = url
+                self.keys = parse_jwks(jwks)
+                self.fetched_at = fetched_at
+
+    def ensure_refresher(self):
+        """ Start the background refresher of the current process.
+
+        Threads don't survive gunicorn forking workers, so every worker
+        starts its own the first time it needs a key.
+        """
+        if self._refresher_pid == os.getpid() or self.app is None:
+            return
+
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+
+            self._refresher_pid = os.getpid()
+            self._refresher = threading.Thread(
+                target=self.run_refresher,
+                args=(self.app,),
+                name='jwks-refresher',
+                daemon=True
+            )
+            self._refresher.start()
+
+    def run_refresher(self, app):
+        with app.app_context():
+            while True:
+                time.sleep(app.config.get('JWKS_REFRESH_INTERVAL'))
+                if self._refresher_pid != os.getpid():
+                    return
+
+                try:
+                    self.refresh(jwks_url())
+                except Exception:
+                    app.logger.exception('JWKS refresher failed')
+
+    def stop_refresher(self):
+        self._refresher_pid = None
+
+
+jwks_store = JwksKeyStore()
@@ -0,0 +1,96 @@
+from limbook_api.db import db, BaseDbModel
+
+role_permission = db.Table(
+    'role_permission',
+    db.Column(
+        'role_id', db.Integer,
+        db.ForeignKey('role.id', ondelete="cascade"),
+        primary_key=True
+    ),
+    db.Column(
+        'permission_id', db.Integer,
+        db.ForeignKey('permission.id'),
+        primary_key=True
+    )
+)
+
+
+class Permission(BaseDbModel):
+    """Permissions"""
+
+    slug = db.Column(db.String, nullable=False, unique=True)
+    name = db.Column(db.String, nullable=False)
+    description = db.Column(db.String, nullable=False)
+
+    """
+    serializers()
+        format the data for the api
+    """
+    def serializers(self):
+        return {
+            'id': lambda: self.id,
+            'slug': lambda: self.slug,
+            'name': lambda: self.name,
+            'description': lambda: self.description
+        }
+
+
+class Role(BaseDbModel):
+    """Roles"""
+
+    slug = db.Column(db.String, nullable=False, unique=True)
+    name = db.Column(db.String, nullable=False)
+    description = db.Column(db.String, nullable=False)
+
+    permissions = db.relationship(
+        'Permission', secondary=role_permission, lazy=True
+    )
+
+    """
+    serializers()
+        format the data for the api
+    """
+    def serializers(self):
+        return {
+            'id': lambda: self.id,
+            'slug': lambda: self.slug,
+            'name': lambda: self.name,
+            'description': lambda: self.description,
+            'permissions': lambda: [
+                permission.slug for permission in self.permissions
+            ]
+        }
+
+
+class User(BaseDbModel):
+    """Users managed by the "database" auth driver"""
+
+    first_name = db.Column(db.String, nullable=False)
+    last_name = db.Column(db.String, nullable=False)
+    email = db.Column(db.String, nullable=False, unique=True)
+    email_verified = db.Column(db.Boolean, nullable=False, default=False)
+    password = db.Column(db.String, nullable=False)
+    role_id = db.Column(
+        db.Integer, db.ForeignKey('role.id'),
+        nullable=False
+    )
+    role = db.relationship('Role', uselist=False, lazy=True)
+
+    @property
+    def auth_id(self):
+        """ Id used as the "sub" claim of the tokens issued to the user """
+        return 'database|' + str(self.id)
+
+    """
+    serializers()
+        format the data for the api
+    """
+    def serializers(self):
+        return {
+            'id': lambda: self.id,
+            'first_name': lambda: self.first_name,
+            'last_name': lambda: self.last_name,
+            'email': lambda: self.email,
+            'email_verified': lambda: self.email_verified,
+            'role': lambda: self.role.slug
+        }
@@ -0,0 +1,75 @@
+import threading
+
+from config import Config
+
+
+class PermissionRegistry:
+    """ Assigns every permission string its own bit.
+
+    A list of permissions can then be represented by a single integer and
+    checking whether any required permission is granted becomes one
+    bitwise "and". New permissions get a bit the first time they are seen.
+    """
+
+    def __init__(self, permissions=()):
+        self.bits = {}
+        self._lock = threading.Lock()
+        for permission in permissions:
+            self.bit(permission)
+
+    def bit(self, permission):
+        bit = self.bits.get(permission)
+        if bit is None:
+            with self._lock:
+                bit = self.bits.setdefault(permission, 1 << len(self.bits))
+
+        return bit
+
+    def mask(self, permissions):
+        """ Combine permissions into a bitmask.
+
+            Parameters:
+                permissions (string|list): e.g: 'read:posts',
+                    ['create:reacts', 'update:reacts']. An empty string
+                    means no permission.
+
+            Returns:
+                mask (int)
+        """
+        if not permissions:
+            return 0
+
+        if isinstance(permissions, str):
+            return self.bit(permissions)
+
+        mask = 0
+        for permission in permissions:
+            mask |= self.bit(permission)
+
+        return mask
+
+
+permission_registry = PermissionRegistry(sorted({
+    permission
+    for permissions in Config.INITIAL_ROLES_AND_PERMISSIONS.values()
+    for permission in permissions
+}))
+
+
+def permission_mask(permissions):
+    """ Bitmask of the given permission or list of permissions. """
+    return permission_registry.mask(permissions)
+
+
+def has_permission(required_mask, granted_mask):
+    """ Check if any of the required permissions is granted.
+
+        Parameters:
+            required_mask (int): Mask of required permissions, 0 when the
+                resource only needs an authenticated user
+            granted_mask (int): Mask of permissions in the token
+
+        Returns:
+            boolean: Whether user has the permission or not.
+    """
+    return not required_mask or bool(required_mask & granted_mask)
@@ -0,0 +1,142 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from redis.exceptions import RedisError
+
+from limbook_api.errors.rate_limit_error import RateLimitError
+from worker import conn
+
+# Token bucket kept in a redis hash. Refills the bucket for the time
+# passed since the last request and takes up to cost tokens, all in one
+# round trip.
+#
+# KEYS[1]: bucket key
+# ARGV: burst, tokens refilled per second, current time in seconds, cost
+# Returns: tokens taken, seconds until the next token when short of cost
+TOKEN_BUCKET_SCRIPT = """
+local burst = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local taken = math.min(cost, math.floor(tokens))
+tokens = tokens - taken
+local retry_after = 0
+if taken < cost then
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HMSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {taken, tostring(retry_after)}
+"""
+
+
+def take_token(bucket, burst, rate, now, cost=1):
+    """ Take up to cost tokens from an in-process bucket.
+
+        Parameters:
+            bucket (list): [tokens, last refill time], updated in place
+            burst (int): Bucket capacity
+            rate (float): Tokens refilled per second
+            now (float): Current time in seconds
+            cost (int): Tokens wanted
+
+        Returns:
+            taken (int): Tokens taken, at most cost
+            retry_after (float): Seconds until the next token is available,
+                0 when all cost tokens were taken
+    """
+    tokens = min(burst, bucket[0] + max(0, now - bucket[1]) * rate)
+    taken = min(cost, math.floor(tokens))
+    bucket[0] = tokens - taken
+    bucket[1] = now
+    if taken < cost:
+        return taken, (1 - bucket[0]) / rate
+
+    return taken, 0
+
+
+class RateLimiter:
+    """ Per user and permission token bucket rate limiter.
+
+    Buckets live in redis so every worker shares them. When redis is
+    disabled or unreachable, each process falls back to its own buckets.
+    """
+
+    key_prefix = 'rate_limit:'
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.script = connection.register_script(TOKEN_BUCKET_SCRIPT)
+        self.local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self.local.clear()
+
+    def limit_for(self, permission):
+        limits = current_app.config.get('RATE_LIMITS')
+        return limits.get(permission, limits.get('default'))
+
+    def hit(self, user_id, permission, cost=1):
+        """ Count requests against the user's bucket for a permission.
+
+            Parameters:
+                user_id (string): Id of the authenticated user
+                permission (string): Permission the route requires
+                cost (int): Number of requests to count
+
+            Returns:
+                taken (int): Requests counted, fewer than cost when the
+                    user ran out of requests part way
+
+            Raises:
+                RateLimitError: User ran out of requests
+        """
+        burst, rate = self.limit_for(permission)
+        key = self.key_prefix + permission + ':' + str(user_id)
+        now = time.time()
+
+        taken = None
+        if current_app.config.get('USE_REDIS'):
+            try:
+                taken, retry_after = self.script(
+                    keys=[key], args=[burst, rate, now, cost])
+                taken, retry_after = int(taken), float(retry_after)
+            except RedisError:
+                current_app.logger.exception('Unable to rate limit')
+
+        if taken is None:
+            taken, retry_after = self.hit_local(key, burst, rate, now, cost)
+
+        if taken == 0:
+            raise RateLimitError({
+                'code': 'too_many_requests',
+                'description': 'Too many requests'
+            }, 429, retry_after)
+
+        return taken
+
+    def hit_local(self, key, burst, rate, now, cost):
+        with self._lock:
+            bucket = self.local.get(key)
+            if bucket is None:
+                bucket = self.local[key] = [burst, now]
+            self.local.move_to_end(key)
+
+            # forget the least recently seen buckets
+            while len(self.local) > current_app.config.get(
+                    'RATE_LIMIT_LOCAL_MAX_BUCKETS'):
+                self.local.popitem(last=False)
+
+            return take_token(bucket, burst, rate, now, cost)
+
+
+rate_limiter = RateLimiter(conn)
@@ -1,10 +1,90 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, abort, request, current_app
 
-from limbook_api.v1.auth.utils import requires_auth
+from limbook_api.v1.auth.database_driver import authenticate, \
+    issue_tokens, verify_local_jwt, user_from_payload, validate_login_data, \
+    validate_refresh_data
+from limbook_api.v1.auth.rate_limit import rate_limiter
+from limbook_api.v1.auth.utils import requires_auth, blacklist_token_once
 
 auth = Blueprint('auth', __name__)
 
 
+def requires_database_driver():
+    """ Token endpoints only exist when users are managed locally """
+    if current_app.config.get('AUTH_DRIVER') != 'database':
+        abort(404)
+
+
+# ====================================
+# ROUTES
+# ====================================
+@auth.route("/auth/login", methods=['POST'])
+def login():
+    """ Issue tokens for valid credentials
+
+        Post data:
+            email (string)
+            password (string)
+
+        Returns:
+            success (boolean)
+            access_token (string)
+            refresh_token (string)
+            token_type (string)
+            expires_in (int): Access token validity in seconds
+    """
+    requires_database_driver()
+
+    # checking passwords is slow on purpose, limit guesses per client
+    if current_app.config.get('RATE_LIMIT_ENABLED'):
+        rate_limiter.hit(request.remote_addr, 'auth:login')
+
+    data = request.get_json()
+    validate_login_data(data)
+
+    user = authenticate(data.get('email'), data.get('password'))
+
+    return jsonify({
+        "success": True,
+        **issue_tokens(user)
+    })
+
+
+@auth.route("/auth/refresh", methods=['POST'])
+def refresh():
+    """ Exchange a refresh token for a new pair of tokens
+
+    The refresh token can only be used once.
+
+        Post data:
+            refresh_token (string)
+
+        Returns:
+            success (boolean)
+            access_token (string)
+            refresh_token (string)
+            token_type (string)
+            expires_in (int): Access token validity in seconds
+    """
+    requires_database_driver()
+
+    data = request.get_json()
+    validate_refresh_data(data)
+
+    refresh_token = data.get('refresh_token')
+    payload = verify_local_jwt(refresh_token, token_type='refresh')
+    user = user_from_payload(payload)
+
+    # only the request that blacklists the token gets new ones
+    if not blacklist_token_once(refresh_token):
+        abort(401)
+
+    return jsonify({
+        "success": True,
+        **issue_tokens(user)
+    })
+
+
 # ====================================
 # SECURE ROUTES
 # ====================================
@@ -0,0 +1,88 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+
+def token_digest(token):
+    """ Digest used to index a token without keeping the token itself. """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class VerifiedTokenCache:
+    """ Bounded LRU cache of verified token claims and permission masks.
+
+    Entries are keyed by the token digest and expire at the token's own
+    "exp" claim, so a cached token is never accepted for longer than the
+    identity provider allows.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """ Get the verified claims of a token.
+
+            Parameters:
+                token (string): Encoded token
+
+            Returns:
+                entry (tuple|None): (payload, granted_mask) or None when
+                    not cached
+        """
+        key = token_digest(token)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            payload, granted_mask, expires_at = entry
+            if expires_at <= time.time():
+                del self.entries[key]
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return payload, granted_mask
+
+    def set(self, token, payload, granted_mask):
+        """ Cache the verified claims until the token expires. """
+        expires_at = payload.get('exp')
+        if not expires_at:
+            return
+
+        max_size = current_app.config.get('VERIFIED_TOKEN_CACHE_SIZE')
+        key = token_digest(token)
+        with self._lock:
+            self.entries[key] = (payload, granted_mask, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > max_size:
+                self.entries.popitem(last=False)
+
+    def discard(self, token):
+        """ Remove a token, e.g. when it gets blacklisted. """
+        with self._lock:
+            self.entries.pop(token_digest(token), None)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+verified_tokens = VerifiedTokenCache()
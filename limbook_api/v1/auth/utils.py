@@ -1,12 +1,16 @@
 from functools import wraps
-from functools import wraps
-from urllib.request import urlopen
 
 import jwt
-from flask import current_app, abort, request, json
+from flask import current_app, abort, request, g
 from jose import jwt
 
-from limbook_api import AuthError, cache
+from limbook_api import AuthError
+from limbook_api.v1.auth.blacklist import token_blacklist
+from limbook_api.v1.auth.database_driver import verify_local_jwt
+from limbook_api.v1.auth.jwks import jwks_store
+from limbook_api.v1.auth.permissions import permission_mask, has_permission
+from limbook_api.v1.auth.rate_limit import rate_limiter
+from limbook_api.v1.auth.token_cache import verified_tokens
 
 
 def mock_token_verification(permission=None):
@@ -62,18 +66,10 @@ def check_permissions(required_permission, payload):
         Returns:
             boolean: Whether user has the permission or not.
     """
-    if required_permission == '':
-        return True
-
-    if isinstance(required_permission, str):
-        required_permission = [required_permission]
-
-    user_permissions = payload.get('permissions')
-    if user_permissions and \
-            len(list(set(required_permission) & set(user_permissions))) > 0:
-        return True
-
-    return False
+    return has_permission(
+        permission_mask(required_permission),
+        permission_mask(payload.get('permissions'))
+    )
 
 
 def requires_auth(permission=''):
@@ -87,7 +83,13 @@ def requires_auth(permission=''):
 
         Raises:
             AuthError: Unable to provide access
+            RateLimitError: User sent too many requests
     """
+    # compile the requirement once instead of on every request
+    required_mask = permission_mask(permission)
+    rate_limit_key = (
+        permission if isinstance(permission, str) else ','.join(permission)
+    ) or 'authenticated'
 
     def requires_auth_decorator(f):
         @wraps(f)
@@ -99,18 +101,25 @@ def requires_auth(permission=''):
                 payload = mock_token_verification(
                     permission=request.args.get('permission')
                 )
+                granted_mask = permission_mask(payload.get('permissions'))
             else:
                 token = get_token_from_auth_header()
-                payload = verify_decode_jwt(token)
+                payload, granted_mask = verify_token(token)
 
-            current_app.config['payload'] = payload
+            # keep the claims in the request context so concurrent
+            # requests handled by the same process don't share them
+            g.auth_payload = payload
+            g.auth_permissions = granted_mask
 
-            if not check_permissions(permission, payload):
+            if not has_permission(required_mask, granted_mask):
                 raise AuthError({
                     'code': 'no_permission',
                     'description': 'No Permission'
                 }, 401)
 
+            if current_app.config.get('RATE_LIMIT_ENABLED'):
+                rate_limiter.hit(auth_user_id(), rate_limit_key)
+
             return f(*args, **kwargs)
 
         return wrapper
@@ -118,8 +127,44 @@ def requires_auth(permission=''):
     return requires_auth_decorator
 
 
+def verify_token(token):
+    """ Verify the token, reusing the claims of recently verified tokens.
+
+        Parameters:
+            token (string): Extracted token from Auth header
+
+        Returns:
+            entry (tuple): Claims decoded from token and the bitmask of
+                the permissions they grant
+
+        Raises:
+            AuthError: Token is revoked or unable to verify jwt
+    """
+    if is_token_blacklisted(token):
+        raise AuthError({
+            'code': 'token_revoked',
+            'description': 'Token has been revoked'
+        }, 401)
+
+    entry = verified_tokens.get(token)
+    if entry is None:
+        if current_app.config.get('AUTH_DRIVER') == 'database':
+            payload = verify_local_jwt(token)
+        else:
+            payload = verify_decode_jwt(token)
+        entry = (payload, permission_mask(payload.get('permissions')))
+        verified_tokens.set(token, *entry)
+
+    return entry
+
+
+def auth_payload():
+    """ Claims of the token used to authenticate the current request. """
+    return g.get('auth_payload')
+
+
 def auth_user_id():
-    payload = current_app.config.get('payload')
+    payload = auth_payload()
     if payload is None:
         abort(401)
 
@@ -127,18 +172,27 @@ def auth_user_id():
 
 
 def blacklist_token(token):
-    # for k in cache.cache._cache:
-    #     print(k, cache.get(k))
-    cache.set(token, "blacklisted", timeout=60*60)
+    token_blacklist.revoke(
+        token, current_app.config.get('REFRESH_TOKEN_VALID_TIME'))
+    verified_tokens.discard(token)
+
+
+def blacklist_token_once(token):
+    """ Blacklist a token, False when it was blacklisted already """
+    revoked = token_blacklist.revoke_once(
+        token, current_app.config.get('REFRESH_TOKEN_VALID_TIME'))
+    verified_tokens.discard(token)
+    return revoked
 
 
 def is_token_blacklisted(token):
-    return cache.get(token) == 'blacklisted'
+    return token_blacklist.is_revoked(token)
 
 
 def user_can(permission):
-    payload = current_app.config.get('payload')
-    return check_permissions(permission, payload)
+    return has_permission(
+        permission_mask(permission), g.get('auth_permissions', 0)
+    )
 
 
 def verify_decode_jwt(token):
@@ -157,29 +211,17 @@ def verify_decode_jwt(token):
     algorithms = current_app.config.get('ALGORITHMS')
     api_audience = current_app.config.get('API_AUDIENCE')
 
-    jsonurl = urlopen(f'https://{auth0_domain}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
-
     # Get the data in the header
     unverified_header = jwt.get_unverified_header(token)
 
     # choose our key
-    rsa_key = {}
     if 'kid' not in unverified_header:
         raise AuthError({
             'code': 'invalid_header',
             'description': 'Authorization malformed'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    rsa_key = jwks_store.get_key(unverified_header['kid'])
 
     if rsa_key:
         try:
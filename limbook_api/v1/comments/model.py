@@ -1,4 +1,5 @@
 from limbook_api.db import db, BaseDbModel
+from limbook_api.db.search import search_vector_column, make_searchable
 
 
 class Comment(BaseDbModel):
@@ -8,29 +9,59 @@ class Comment(BaseDbModel):
     content = db.Column(db.String, nullable=False)
     user_id = db.Column(db.String, nullable=False)
     post_id = db.Column(
-        db.Integer, db.ForeignKey('post.id'),
+        db.Integer, db.ForeignKey('post.id', ondelete="cascade"),
         nullable=False
     )
     post = db.relationship(
-        'Post', backref='comments', uselist=False,
-        lazy=True
+        'Post', backref=db.backref('comments', passive_deletes=True),
+        uselist=False, lazy=True
     )
+    # posts are formatted with their comments
+    touches = ('post',)
     parent_id = db.Column(
-        db.Integer, db.ForeignKey('comment.id'),
+        db.Integer, db.ForeignKey('comment.id', ondelete="cascade"),
         nullable=True
     )
+    reply_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0'
+    )
+    # comments are counted by their post and by the comment they reply to
+    counters = {'post_id': 'comment_count', 'parent_id': 'reply_count'}
+    search_vector = search_vector_column()
 
     """
-    format()
+    counted_rows()
+        the database deletes the replies along with the comment, the post
+        loses all of them
+    """
+    def counted_rows(self, column):
+        if column != 'post_id':
+            return 1
+
+        replies = db.session.query(Comment.id)\
+            .filter(Comment.parent_id == self.id)\
+            .cte(recursive=True)
+        replies = replies.union_all(
+            db.session.query(Comment.id)
+            .filter(Comment.parent_id == replies.c.id)
+        )
+        return 1 + db.session.query(db.func.count(replies.c.id)).scalar()
+
+    """
+    serializers()
         format the data for the api
     """
-    def format(self):
+    def serializers(self):
         return {
-            'id': self.id,
-            'content': self.content,
-            'user_id': self.user_id,
-            'post_id': self.post_id,
-            'parent_id': self.parent_id,
-            'created_on': self.created_on.__str__(),
-            'updated_on': self.updated_on.__str__(),
+            'id': lambda: self.id,
+            'content': lambda: self.content,
+            'user_id': lambda: self.user_id,
+            'post_id': lambda: self.post_id,
+            'parent_id': lambda: self.parent_id,
+            'reply_count': lambda: self.reply_count,
+            'created_on': lambda: self.created_on,
+            'updated_on': lambda: self.updated_on,
         }
+
+
+make_searchable(Comment)
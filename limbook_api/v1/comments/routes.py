@@ -1,8 +1,17 @@
 from flask import Blueprint, jsonify, abort, request
 
+from limbook_api.bulk import bulk_items, validate_items, item_error, \
+    charge_items
+from limbook_api.db import db, unit_of_work
+from limbook_api.db.utils import row_validator, requested_fields, \
+    load_fields, insert_rows
+from limbook_api.fragment_cache import cached_fragments, fragment_variant
+from limbook_api.response_cache import conditional_response, \
+    cached_response, invalidates
 from limbook_api.v1.auth.utils import requires_auth, auth_user_id
 from limbook_api.v1.comments import Comment, filter_comments, \
     validate_comment_data, validate_comment_create_data
+from limbook_api.v1.posts import Post
 
 comments = Blueprint('comments', __name__)
 
@@ -12,6 +21,8 @@ comments = Blueprint('comments', __name__)
 # ====================================
 @comments.route("/comments", methods=['GET'])
 @requires_auth('read:comments')
+@conditional_response(lambda: filter_comments(validator_only=True))
+@cached_response('comments')
 def get_comments():
     """ Get all available comments
 
@@ -19,20 +30,33 @@ def get_comments():
              search_term (str)
              page (int)
              post_id (int)
+             fields (str): Comma separated fields to return
+             after (str): Cursor of the page before
+             before (str): Cursor of the page after
+             total (str): "exact" (default), "estimate" or "none"
 
         Returns:
             success (boolean)
             comments (list)
-            total (int)
+            next_cursor (str|None)
+            prev_cursor (str|None)
+            total (int|None)
             query_args (dict)
     """
     try:
+        page = filter_comments()
+        fields = requested_fields()
         return jsonify({
             'success': True,
-            'comments': [
-                comment.format() for comment in filter_comments()
-            ],
-            'total': filter_comments(count_only=True),
+            'comments': cached_fragments(
+                page, fragment_variant('comment', fields),
+                lambda missing: [
+                    comment.format(fields) for comment in missing
+                ]
+            ),
+            'next_cursor': page.next_cursor,
+            'prev_cursor': page.prev_cursor,
+            'total': page.total,
             'query_args': request.args,
         })
     except Exception as e:
@@ -41,18 +65,25 @@ def get_comments():
 
 @comments.route("/comments/<int:comment_id>", methods=['GET'])
 @requires_auth('read:comments')
+@conditional_response(
+    lambda comment_id: row_validator(Comment, comment_id))
 def get_comment(comment_id):
     """ Get comment
 
+        Query Parameters:
+             fields (str): Comma separated fields to return
+
         Returns:
             success (boolean)
             comment (dict)
     """
-    comment = Comment.query.filter(Comment.id == comment_id).first_or_404()
+    fields = requested_fields()
+    comment = load_fields(Comment, Comment.query, fields).filter(
+        Comment.id == comment_id).first_or_404()
     try:
         return jsonify({
             'success': True,
-            'comment': comment.format()
+            'comment': comment.format(fields)
         })
     except Exception as e:
         abort(400)
@@ -60,6 +91,7 @@ def get_comment(comment_id):
 
 @comments.route("/comments", methods=['POST'])
 @requires_auth('create:comments')
+@invalidates('comments')
 def create_comments():
     """ Create new comments
 
@@ -94,9 +126,91 @@ def create_comments():
         abort(400)
 
 
+@comments.route("/comments/bulk", methods=['POST'])
+@requires_auth('create:comments')
+@invalidates('comments')
+def bulk_create_comments():
+    """ Create many comments at once
+
+        Post data:
+            comments (list): Comments with the data of POST /comments, at
+                most BULK_CREATE_LIMIT
+
+        Returns:
+            success (boolean)
+            results (list): For each comment, in order, either
+                {"success": true, "comment": dict} or
+                {"success": false, "error": int, "message": string}.
+                Every comment counts against the create:comments rate
+                limit, the ones over it fail with 429
+            created (int)
+    """
+    items = bulk_items(request.get_json(), 'comments')
+    results = validate_items(items, validate_comment_create_data)
+
+    # post ids are read like the integer column of POST /comments reads
+    # them, so "1" is post 1
+    post_ids = {}
+    for index, result in enumerate(results):
+        if result is None:
+            try:
+                post_ids[index] = int(items[index].get('post_id'))
+            except (TypeError, ValueError):
+                post_ids[index] = None
+
+    # comments of posts that do not exist are not created
+    wanted = {post_id for post_id in post_ids.values() if post_id}
+    existing = {
+        post_id for post_id, in Post.query.with_entities(Post.id)
+        .filter(Post.id.in_(list(wanted)))
+    } if wanted else set()
+    for index, post_id in post_ids.items():
+        if post_id not in existing:
+            results[index] = item_error(404)
+    charge_items(results, auth_user_id(), 'create:comments')
+
+    valid = [index for index, result in enumerate(results) if result is None]
+
+    try:
+        with unit_of_work():
+            comment_ids = insert_rows(Comment, [{
+                'content': items[index].get('content'),
+                'user_id': auth_user_id(),
+                'post_id': post_ids[index]
+            } for index in valid])
+
+            # rows inserted without the orm do not touch their posts
+            if valid:
+                Post.query.filter(Post.id.in_([
+                    post_ids[index] for index in valid
+                ])).update({
+                    Post.version: Post.version + 1,
+                    Post.updated_on: db.func.now()
+                }, synchronize_session=False)
+
+        created = {
+            comment.id: comment for comment in
+            Comment.query.filter(Comment.id.in_(comment_ids))
+        } if comment_ids else {}
+        for index, comment_id in zip(valid, comment_ids):
+            results[index] = {
+                'success': True,
+                'comment': created[comment_id].format()
+            }
+
+        return jsonify({
+            "success": True,
+            "results": results,
+            "created": len(comment_ids)
+        })
+    except Exception as e:
+        abort(400)
+
+
 @comments.route(
     "/comments/<int:comment_id>", methods=['PATCH'])
 @requires_auth('update:comments')
+@invalidates('comments')
 def update_comments(comment_id):
     """ Update comments
 
@@ -138,6 +252,7 @@ def update_comments(comment_id):
 
 @comments.route("/comments/<int:comment_id>", methods=['DELETE'])
 @requires_auth('delete:comments')
+@invalidates('comments')
 def delete_comments(comment_id):
     """ Delete comments
 
@@ -167,6 +282,7 @@ def delete_comments(comment_id):
 
 @comments.route("/comments/<int:comment_id>/replies", methods=['POST'])
 @requires_auth('create:comments')
+@invalidates('comments')
 def reply_comments(comment_id):
     """ Reply comments
 
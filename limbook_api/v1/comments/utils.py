@@ -2,6 +2,7 @@ from random import randint
 
 from flask import abort, request
 
+from limbook_api.db.search import search
 from limbook_api.db.utils import filter_model
 from limbook_api.v1.comments import Comment
 
@@ -37,13 +38,13 @@ def validate_comment_data(data):
         abort(422)
 
 
-def filter_comments(count_only=False):
+def filter_comments(count_only=False, validator_only=False):
     query = Comment.query
 
     # search
     search_term = request.args.get('search_term')
     if search_term:
-        query = query.filter(Comment.content.ilike("%{}%".format(search_term)))
+        query = search(Comment, query, search_term)
 
     # comment belongs to post
     post_id = request.args.get('post_id')
@@ -51,4 +52,5 @@ def filter_comments(count_only=False):
         query = query.filter(Comment.post_id == post_id)
 
     # return filtered data
-    return filter_model(Comment, query, count_only=count_only)
+    return filter_model(
+        Comment, query, count_only=count_only, validator_only=validator_only)
@@ -1,6 +1,6 @@
 from flask import json
 
-from limbook_api.db import db, BaseDbModel
+from limbook_api.db import db, BaseDbModel, after_commit
 
 post_image = db.Table(
     'post_image',
@@ -11,8 +11,12 @@ post_image = db.Table(
     ),
     db.Column(
         'image_id', db.Integer,
-        db.ForeignKey('image.id'),
+        db.ForeignKey('image.id', ondelete="cascade"),
         primary_key=True
+    ),
+    # order of the image in the post, see attach_images()
+    db.Column(
+        'position', db.Integer, nullable=False, default=0, server_default='0'
     )
 )
 
@@ -28,31 +32,35 @@ class Image(BaseDbModel):
 
     post = db.relationship(
         'Post', secondary=post_image,
-        backref=db.backref('images', lazy=True)
+        backref=db.backref(
+            'images', lazy=True, passive_deletes=True,
+            order_by=(post_image.c.position, post_image.c.image_id)
+        ),
+        passive_deletes=True
     )
+    # posts are formatted with their images
+    touches = ('post',)
 
     """
-    delete()
-        deletes a image from the database
-        the model must exist in the database
+    stage_delete()
+        stages the deletion of a image, its files are deleted once the
+        deletion is committed
     """
-    def delete(self):
-        # delete image file
-        from limbook_api.v1.image_manager import delete_image_set
-        delete_image_set(self)
-        # delete image data
+    def stage_delete(self):
+        from limbook_api.v1.image_manager import delete_image_sets
+        url = self.url
         db.session.delete(self)
-        db.session.commit()
+        after_commit(lambda: delete_image_sets([url]))
 
     """
-    format()
+    serializers()
         format the data for the api
     """
-    def format(self):
+    def serializers(self):
         return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'url': json.loads(self.url),
-            'created_on': self.created_on.__str__(),
-            'updated_on': self.updated_on.__str__()
+            'id': lambda: self.id,
+            'user_id': lambda: self.user_id,
+            'url': lambda: json.loads(self.url),
+            'created_on': lambda: self.created_on,
+            'updated_on': lambda: self.updated_on
         }
@@ -1,9 +1,15 @@
 from flask import Blueprint, jsonify, abort, request, json
 
+from limbook_api.db import unit_of_work
+from limbook_api.db.utils import row_validator, requested_fields, \
+    load_fields
+from limbook_api.response_cache import conditional_response, \
+    cached_response, invalidates
 from limbook_api.v1.auth.utils import requires_auth, auth_user_id
 from limbook_api.v1.image_manager import Image, create_img_set, \
     validate_image_data, filter_images
-from limbook_api.v1.posts import Post, get_images_list_using_ids
+from limbook_api.v1.posts import Post, get_images_list_using_ids, \
+    attach_images
 
 image_manager = Blueprint('image_manager', __name__)
 
@@ -13,27 +19,39 @@ image_manager = Blueprint('image_manager', __name__)
 # ====================================
 @image_manager.route("/images", methods=['GET'])
 @requires_auth('read:images')
+@conditional_response(lambda: filter_images(validator_only=True),
+                      user_scoped=True)
+@cached_response('images', user_scoped=True)
 def get_images():
     """ Update images
 
         Query params:
             page (int)
             post_id (int)
+            fields (str): Comma separated fields to return
+            after (str): Cursor of the page before
+            before (str): Cursor of the page after
+            total (str): "exact" (default), "estimate" or "none"
 
         Returns:
             success (boolean)
             images (list): List of images
-            total (int)
+            next_cursor (str|None)
+            prev_cursor (str|None)
+            total (int|None)
             query_args (dict)
     """
 
     try:
+        page = filter_images()
         return jsonify({
             'success': True,
             'images': [
-                image.format() for image in filter_images()
+                image.format(requested_fields()) for image in page
             ],
-            'total': filter_images(count_only=True),
+            'next_cursor': page.next_cursor,
+            'prev_cursor': page.prev_cursor,
+            'total': page.total,
             'query_args': request.args,
         })
     except Exception as e:
@@ -42,18 +60,25 @@ def get_images():
 
 @image_manager.route("/images/<int:image_id>", methods=['GET'])
 @requires_auth('read:images')
+@conditional_response(lambda image_id: row_validator(Image, image_id),
+                      user_scoped=True)
 def get_image(image_id):
     """ Update images
 
         Parameters:
             image_id (int): Id of image
 
+        Query params:
+            fields (str): Comma separated fields to return
+
         Returns:
             success (boolean)
             image (dist)
     """
     # get image
-    image = Image.query.filter(Image.id == image_id).first_or_404()
+    fields = requested_fields()
+    image = load_fields(Image, Image.query, fields, required=('user_id',))\
+        .filter(Image.id == image_id).first_or_404()
 
     # can retrieve own image only
     if image.user_id != auth_user_id():
@@ -63,7 +88,7 @@ def get_image(image_id):
         # return the result
         return jsonify({
             'success': True,
-            'image': image.format()
+            'image': image.format(fields)
         })
     except Exception as e:
         abort(400)
@@ -71,6 +96,7 @@ def get_image(image_id):
 
 @image_manager.route("/images", methods=['POST'])
 @requires_auth('create:images')
+@invalidates('images')
 def create_images():
     """ Create new images
 
@@ -107,6 +133,7 @@ def create_images():
 
 @image_manager.route("/images/<int:image_id>", methods=['DELETE'])
 @requires_auth('delete:images')
+@invalidates('images')
 def delete_images(image_id):
     """ Delete images
 
@@ -137,6 +164,7 @@ def delete_images(image_id):
 
 @image_manager.route("/posts/<int:post_id>/images", methods=['POST'])
 @requires_auth('update:posts')
+@invalidates('images', 'posts')
 def attach_images_to_post(post_id):
     """ Attach images to post
 
@@ -163,8 +191,9 @@ def attach_images_to_post(post_id):
     images = get_images_list_using_ids(image_ids)
 
     try:
-        post.images = images
-        post.update()
+        with unit_of_work():
+            attach_images(post, images)
+
         return jsonify({
             "success": True,
             "post": post.format()
@@ -5,8 +5,10 @@ from random import randint
 
 from PIL import Image as PImage
 from flask import current_app, json, abort, jsonify
+from redis.exceptions import RedisError
 from werkzeug.utils import secure_filename
 
+from limbook_api import q
 from limbook_api.db.utils import filter_model
 from limbook_api.v1.auth.utils import auth_user_id
 from limbook_api.errors import ImageUploadError
@@ -83,12 +85,43 @@ def create_img_set(image_file):
         }, 400)
 
 
-def delete_image_set(image):
-    url_set = image.format().get('url')
-    for value in url_set.values():
-        image_path = current_app.root_path + value
-        if os.path.isfile(image_path):
-            os.remove(image_path)
+def remove_files(paths):
+    """ Remove files that still exist
+
+    Runs on the rq worker, so it needs no app context.
+
+        Parameters:
+            paths (list): Absolute paths of files
+    """
+    for path in paths:
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+def delete_image_sets(urls):
+    """ Delete the files of images in the background
+
+    The files are removed by the rq worker, or right away when redis is
+    disabled or unreachable.
+
+        Parameters:
+            urls (list): Json encoded url of each size, see Image.url
+    """
+    paths = [
+        current_app.root_path + value
+        for url in urls for value in json.loads(url).values()
+    ]
+    if not paths:
+        return
+
+    if current_app.config.get('USE_REDIS'):
+        try:
+            q.enqueue(remove_files, paths)
+            return
+        except RedisError:
+            current_app.logger.exception('Unable to enqueue file removal')
+
+    remove_files(paths)
 
 
 def generate_image(user_id=None, url=None):
@@ -114,11 +147,12 @@ def validate_image_data(data):
         abort(422)
 
 
-def filter_images(count_only=False):
+def filter_images(count_only=False, validator_only=False):
     query = Image.query
 
     # Filter current user's images
     query = query.filter(Image.user_id == auth_user_id())
 
     # return filtered data
-    return filter_model(Image, query, count_only=count_only)
+    return filter_model(
+        Image, query, count_only=count_only, validator_only=validator_only)
@@ -1,2 +1,3 @@
 from limbook_api.v1.posts.model import *
+from limbook_api.v1.posts.autocomplete import *
 from limbook_api.v1.posts.utils import *
@@ -0,0 +1,214 @@
+import re
+import threading
+from collections import Counter
+
+from flask import current_app
+from redis.exceptions import RedisError
+
+from worker import conn
+
+WORD = re.compile(r'\w+')
+
+
+def extract_terms(content):
+    """ Distinct lower case words of a text long enough to complete """
+    min_length = current_app.config.get('AUTOCOMPLETE_MIN_TERM_LENGTH')
+    return {
+        word for word in WORD.findall((content or '').lower())
+        if len(word) >= min_length
+    }
+
+
+def term_prefixes(term):
+    max_prefix = current_app.config.get('AUTOCOMPLETE_MAX_PREFIX')
+    return [
+        term[:length]
+        for length in range(1, min(len(term), max_prefix) + 1)
+    ]
+
+
+class AutocompleteIndex:
+    """ Prefix index of the terms used in posts.
+
+    For every prefix, redis keeps a sorted set of the terms starting with
+    it, scored by the number of posts using them, and for every term a
+    sorted set of the ids of those posts. Completing a prefix costs two
+    redis round trips and never touches the database. When redis is
+    disabled or unreachable each process keeps its own index in memory.
+    """
+
+    key_prefix = 'autocomplete:'
+
+    def __init__(self, connection):
+        self.connection = connection
+        # prefix -> Counter of terms, term -> post ids, post id -> terms
+        self.local_prefixes = {}
+        self.local_posts = {}
+        self.local_terms = {}
+        self._lock = threading.Lock()
+
+    def use_redis(self):
+        return current_app.config.get('USE_REDIS')
+
+    def key(self, kind, value):
+        return self.key_prefix + kind + ':' + str(value)
+
+    def clear(self):
+        """ Forget the local index, e.g. between tests. """
+        with self._lock:
+            self.local_prefixes = {}
+            self.local_posts = {}
+            self.local_terms = {}
+
+    def add_post(self, post):
+        """ Index a new post, or reindex a post after its content changed """
+        self.index(post.id, extract_terms(post.content))
+
+    def remove_post(self, post_id):
+        self.index(post_id, set())
+
+    def rebuild(self, posts):
+        """ Index posts from scratch, dropping everything indexed before
+
+            Parameters:
+                posts (iterable): Every post, e.g. Post.query.yield_per(1000)
+
+            Returns:
+                count (int): Number of posts indexed
+        """
+        self.clear()
+        if self.use_redis():
+            try:
+                for key in self.connection.scan_iter(self.key_prefix + '*'):
+                    self.connection.delete(key)
+            except RedisError:
+                current_app.logger.exception('Unable to clear autocomplete')
+
+        count = 0
+        for post in posts:
+            self.add_post(post)
+            count += 1
+
+        return count
+
+    def index(self, post_id, terms):
+        """ Replace the indexed terms of a post.
+
+            Parameters:
+                post_id (int): Id of post
+                terms (set): Terms of the post, empty to remove it
+        """
+        if self.use_redis():
+            try:
+                self.index_redis(post_id, terms)
+                return
+            except RedisError:
+                current_app.logger.exception('Unable to index post')
+
+        with self._lock:
+            old_terms = self.local_terms.pop(post_id, set())
+            for term in old_terms - terms:
+                self.local_posts[term].discard(post_id)
+                for prefix in term_prefixes(term):
+                    counts = self.local_prefixes[prefix]
+                    counts[term] -= 1
+                    if counts[term] <= 0:
+                        del counts[term]
+
+            for term in terms - old_terms:
+                self.local_posts.setdefault(term, set()).add(post_id)
+                for prefix in term_prefixes(term):
+                    self.local_prefixes.setdefault(
+                        prefix, Counter())[term] += 1
+
+            if terms:
+                self.local_terms[post_id] = set(terms)
+
+    def index_redis(self, post_id, terms):
+        post_key = self.key('post', post_id)
+        # the terms of the post are watched, a concurrent reindex of the
+        # same post makes the transaction run again with its terms
+        self.connection.transaction(
+            lambda pipe: self.replace_terms(pipe, post_key, post_id, terms),
+            post_key
+        )
+
+    def replace_terms(self, pipe, post_key, post_id, terms):
+        old_terms = {term.decode() for term in pipe.smembers(post_key)}
+
+        pipe.multi()
+        for term in old_terms - terms:
+            pipe.zrem(self.key('posts', term), post_id)
+            for prefix in term_prefixes(term):
+                prefix_key = self.key('terms', prefix)
+                pipe.zincrby(prefix_key, -1, term)
+                pipe.zremrangebyscore(prefix_key, '-inf', 0)
+
+        for term in terms - old_terms:
+            pipe.zadd(self.key('posts', term), {post_id: post_id})
+            for prefix in term_prefixes(term):
+                pipe.zincrby(self.key('terms', prefix), 1, term)
+
+        pipe.delete(post_key)
+        if terms:
+            pipe.sadd(post_key, *terms)
+
+    def complete(self, text, limit):
+        """ Complete the last word of a search term.
+
+            Parameters:
+                text (string): Search term typed so far
+                limit (int): Maximum number of terms and post ids
+
+            Returns:
+                terms (list): Matching terms, used by most posts first
+                post_ids (list): Ids of posts using them, newest first
+        """
+        words = WORD.findall((text or '').lower())
+        if not words:
+            return [], []
+
+        word = words[-1]
+        prefix = word[:current_app.config.get('AUTOCOMPLETE_MAX_PREFIX')]
+
+        if self.use_redis():
+            try:
+                return self.complete_redis(word, prefix, limit)
+            except RedisError:
+                current_app.logger.exception('Unable to autocomplete')
+
+        with self._lock:
+            counts = self.local_prefixes.get(prefix, {})
+            terms = [
+                term for term, count in sorted(
+                    counts.items(), key=lambda item: (-item[1], item[0]))
+                if term.startswith(word)
+            ][:limit]
+            post_ids = {
+                post_id for term in terms
+                for post_id in self.local_posts.get(term, ())
+            }
+
+        return terms, sorted(post_ids, reverse=True)[:limit]
+
+    def complete_redis(self, word, prefix, limit):
+        # prefixes are capped, longer words are matched against their terms
+        terms = [
+            term.decode() for term in self.connection.zrevrangebyscore(
+                self.key('terms', prefix), '+inf', 1, start=0, num=limit)
+        ]
+        terms = [term for term in terms if term.startswith(word)]
+        if not terms:
+            return [], []
+
+        pipe = self.connection.pipeline(transaction=False)
+        for term in terms:
+            pipe.zrevrange(self.key('posts', term), 0, limit - 1)
+        post_ids = {
+            int(post_id) for ids in pipe.execute() for post_id in ids
+        }
+
+        return terms, sorted(post_ids, reverse=True)[:limit]
+
+
+autocomplete_index = AutocompleteIndex(conn)
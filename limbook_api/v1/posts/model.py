@@ -1,4 +1,5 @@
 from limbook_api.db import db, BaseDbModel
+from limbook_api.db.search import search_vector_column, make_searchable
 
 
 class Post(BaseDbModel):
@@ -6,17 +7,47 @@ class Post(BaseDbModel):
 
     content = db.Column(db.String, nullable=False)
     user_id = db.Column(db.String, nullable=False)
+    # maintained by the flush of reacts and comments, see counters
+    react_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0'
+    )
+    comment_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0'
+    )
+    search_vector = search_vector_column()
 
     """
-    format()
+    serializers()
         format the data for the api
     """
-    def format(self):
+    def serializers(self):
         return {
-            'id': self.id,
-            'content': self.content,
-            'user_id': self.user_id,
-            'images': [image.format() for image in self.images],
-            'reacts': [react.format() for react in self.reacts],
-            'comments': [comment.format() for comment in self.comments]
+            'id': lambda: self.id,
+            'content': lambda: self.content,
+            'user_id': lambda: self.user_id,
+            'images': lambda: [image.format() for image in self.images],
+            'react_count': lambda: self.react_count,
+            'comment_count': lambda: self.comment_count,
+            'reacts': lambda: [react.format() for react in self.reacts],
+            'comments': lambda: [
+                comment.format() for comment in self.comments
+            ]
         }
+
+    """
+    format_summary()
+        format the data for post lists, see format_post_summaries()
+    """
+    def format_summary(self, comments, fields=None):
+        return self.format_fields({
+            'id': lambda: self.id,
+            'content': lambda: self.content,
+            'user_id': lambda: self.user_id,
+            'images': lambda: [image.format() for image in self.images],
+            'react_count': lambda: self.react_count,
+            'comment_count': lambda: self.comment_count,
+            'comments': lambda: [comment.format() for comment in comments]
+        }, fields)
+
+
+make_searchable(Post)
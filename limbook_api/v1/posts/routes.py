@@ -1,8 +1,18 @@
-from flask import Blueprint, jsonify, abort, request
+from flask import Blueprint, jsonify, abort, request, current_app
 
+from limbook_api.bulk import bulk_items, validate_items, charge_items
+from limbook_api.db import db, unit_of_work, after_commit
+from limbook_api.db.utils import row_validator, requested_fields, insert_rows
+from limbook_api.response_cache import conditional_response, \
+    cached_response, invalidates
 from limbook_api.v1.auth.utils import requires_auth, auth_user_id
-from limbook_api.v1.posts import Post, validate_post_data, filter_posts, \
-    get_images_list_using_ids
+from limbook_api.v1.image_manager import Image, post_image, \
+    delete_image_sets
+from limbook_api.v1.posts import Post, validate_post_data, \
+    validate_bulk_post_data, filter_posts, \
+    get_images_list_using_ids, attach_images, get_post_or_404, \
+    requested_includes, format_post_summaries, autocomplete_index, \
+    requests_viewer_state, with_post_relations
 
 posts = Blueprint('posts', __name__)
 
@@ -12,22 +22,39 @@ posts = Blueprint('posts', __name__)
 # ====================================
 @posts.route("/posts", methods=['GET'])
 @requires_auth('read:posts')
+@conditional_response(lambda: filter_posts(validator_only=True),
+                      user_scoped=requests_viewer_state)
+@cached_response('posts', 'comments', 'reacts', 'images',
+                 user_scoped=requests_viewer_state)
 def get_posts():
     """ Get all available posts
 
+        Query parameters:
+            include (string|optional): Comma separated relationships to
+                embed in full, "reacts" and/or "comments"
+            fields (string|optional): Comma separated fields to return
+            after (string|optional): Cursor of the page before
+            before (string|optional): Cursor of the page after
+            total (string|optional): "exact" (default), "estimate" or "none"
+
         Returns:
             success (boolean)
             posts (list)
-            total (int)
+            next_cursor (string|None)
+            prev_cursor (string|None)
+            total (int|None)
             query_args (dic)
     """
     try:
+        includes = requested_includes()
+        page = filter_posts()
         return jsonify({
             'success': True,
-            'posts': [
-                post.format() for post in filter_posts()
-            ],
-            'total': filter_posts(count_only=True),
+            'posts': format_post_summaries(
+                page, includes, requested_fields()),
+            'next_cursor': page.next_cursor,
+            'prev_cursor': page.prev_cursor,
+            'total': page.total,
             'query_args': request.args,
         })
     except Exception as e:
@@ -36,6 +63,7 @@ def get_posts():
 
 @posts.route("/posts", methods=['POST'])
 @requires_auth('create:posts')
+@invalidates('posts')
 def create_posts():
     """ Create new posts
 
@@ -51,6 +79,8 @@ def create_posts():
     data = request.get_json()
 
     validate_post_data(data)
+    image_ids = data.get('image_ids')
+    images = get_images_list_using_ids(image_ids) if image_ids else []
 
     # create post
     post = Post(**{
@@ -59,14 +89,11 @@ def create_posts():
     })
 
     try:
-        post.insert()
+        with unit_of_work():
+            post.add()
+            attach_images(post, images)
 
-        # attach images
-        image_ids = data.get('image_ids')
-        if image_ids:
-            images = get_images_list_using_ids(image_ids)
-            post.images = images
-            post.update()
+        autocomplete_index.add_post(post)
 
         return jsonify({
             "success": True,
@@ -76,20 +103,110 @@ def create_posts():
         abort(400)
 
 
+@posts.route("/posts/bulk", methods=['POST'])
+@requires_auth('create:posts')
+@invalidates('posts')
+def bulk_create_posts():
+    """ Create many posts at once
+
+        Post data:
+            posts (list): Posts with the data of POST /posts, at most
+                BULK_CREATE_LIMIT. Images are attached with
+                POST /posts/<post_id>/images, posts with image_ids fail
+                with 422
+
+        Returns:
+            success (boolean)
+            results (list): For each post, in order, either
+                {"success": true, "post": dict} or
+                {"success": false, "error": int, "message": string}.
+                Every post counts against the create:posts rate limit, the
+                ones over it fail with 429
+            created (int)
+    """
+    items = bulk_items(request.get_json(), 'posts')
+    results = validate_items(items, validate_bulk_post_data)
+    charge_items(results, auth_user_id(), 'create:posts')
+    valid = [index for index, result in enumerate(results) if result is None]
+
+    try:
+        with unit_of_work():
+            post_ids = insert_rows(Post, [{
+                'content': items[index].get('content'),
+                'user_id': auth_user_id()
+            } for index in valid])
+
+        created = {
+            post.id: post for post in with_post_relations(Post.query)
+            .filter(Post.id.in_(post_ids))
+        } if post_ids else {}
+        for index, post_id in zip(valid, post_ids):
+            autocomplete_index.add_post(created[post_id])
+            results[index] = {
+                'success': True,
+                'post': created[post_id].format()
+            }
+
+        return jsonify({
+            "success": True,
+            "results": results,
+            "created": len(post_ids)
+        })
+    except Exception as e:
+        abort(400)
+
+
+@posts.route("/posts/autocomplete", methods=['GET'])
+@requires_auth('read:posts')
+def autocomplete_posts():
+    """ Complete the last word of a post search
+
+    Served from the autocomplete index without querying the database.
+
+        Query parameters:
+            search_term (string): Search term typed so far
+            limit (int|optional): Maximum number of terms and post ids
+
+        Returns:
+            success (boolean)
+            terms (list): Matching terms, used by most posts first
+            post_ids (list): Ids of posts using them, newest first
+    """
+    limit = max(1, min(
+        request.args.get('limit', current_app.config.get(
+            'AUTOCOMPLETE_LIMIT'), type=int),
+        current_app.config.get('AUTOCOMPLETE_LIMIT')
+    ))
+    terms, post_ids = autocomplete_index.complete(
+        request.args.get('search_term'), limit)
+
+    return jsonify({
+        'success': True,
+        'terms': terms,
+        'post_ids': post_ids
+    })
+
+
 @posts.route("/posts/<int:post_id>", methods=['GET'])
 @requires_auth('read:posts')
+@conditional_response(lambda post_id: row_validator(Post, post_id),
+                      user_scoped=True)
 def get_post(post_id):
     """ Get a single post
 
         Parameters:
             post_id (int): Id of post
 
+        Query parameters:
+            fields (string|optional): Comma separated fields to return
+
         Returns:
             success (boolean)
             post (dict)
     """
     # get post
-    post = Post.query.filter(Post.id == post_id).first_or_404()
+    fields = requested_fields()
+    post = get_post_or_404(post_id, fields)
 
     # can update own post only
     if post.user_id != auth_user_id():
@@ -98,7 +215,7 @@ def get_post(post_id):
     try:
         return jsonify({
             "success": True,
-            "post": post.format()
+            "post": post.format(fields)
         })
     except Exception as e:
         abort(400)
@@ -106,6 +223,7 @@ def get_post(post_id):
 
 @posts.route("/posts/<int:post_id>", methods=['PATCH'])
 @requires_auth('update:posts')
+@invalidates('posts', 'images')
 def update_posts(post_id):
     """ Update posts
 
@@ -132,24 +250,28 @@ def update_posts(post_id):
     if post.user_id != auth_user_id():
         abort(403)
 
-    try:
-        # update post
-        content = data.get('content')
-        if content:
-            post.content = data.get('content')
-            post.update()
+    image_ids = data.get('image_ids')
+    images = get_images_list_using_ids(image_ids) if image_ids else []
 
-        # update images
-        image_ids = data.get('image_ids')
-        if image_ids:
-            # delete images
-            for image in post.images:
-                image.delete()
+    try:
+        with unit_of_work():
+            # update post
+            content = data.get('content')
+            if content:
+                post.content = data.get('content')
+
+            # update images
+            if images:
+                # delete images left out of the post
+                for image in post.images:
+                    if image not in images:
+                        image.stage_delete()
+
+                # attach images
+                attach_images(post, images)
 
-            # attach images
-            images = get_images_list_using_ids(image_ids)
-            post.images = images
-            post.update()
+        if content:
+            autocomplete_index.add_post(post)
 
         return jsonify({
             "success": True,
@@ -161,6 +283,7 @@ def update_posts(post_id):
 
 @posts.route("/posts/<int:post_id>", methods=['DELETE'])
 @requires_auth('delete:posts')
+@invalidates('posts', 'images', 'comments', 'reacts')
 def delete_posts(post_id):
     """ Delete posts
 
@@ -182,16 +305,31 @@ def delete_posts(post_id):
         abort(403)
 
     try:
-        # delete images
-        for image in post.images:
-            image.delete()
-
-        # delete post
-        post.delete()
+        with unit_of_work():
+            images = db.session.query(Image.id, Image.url)\
+                .join(post_image).filter(post_image.c.post_id == post_id)\
+                .all()
+
+            # comments, reacts and image links are deleted by the
+            # database, whatever their number
+            Post.query.filter(Post.id == post_id)\
+                .delete(synchronize_session=False)
+            # detached like posts deleted by the orm, keeping its data
+            db.session.expunge(post)
+            if images:
+                Image.query.filter(Image.id.in_([
+                    image.id for image in images
+                ])).delete(synchronize_session=False)
+
+            # files are removed in the background once the rows are gone
+            after_commit(lambda: delete_image_sets(
+                [image.url for image in images]))
+
+        autocomplete_index.remove_post(post_id)
 
         return jsonify({
             "success": True,
-            "deleted_id": post.id
+            "deleted_id": post_id
         })
     except Exception as e:
         abort(400)
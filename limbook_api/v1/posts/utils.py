@@ -1,11 +1,17 @@
-from os import abort
 from random import randint
 
-from flask import jsonify, request
+from flask import jsonify, request, current_app, abort
+from sqlalchemy import func, case
+from sqlalchemy.orm import selectinload
 
-from limbook_api.db.utils import filter_model
+from limbook_api.db import db
+from limbook_api.db.search import search
+from limbook_api.db.utils import filter_model, load_fields, requested_fields
+from limbook_api.errors import ValidationError
+from limbook_api.fragment_cache import cached_fragments, fragment_variant
 from limbook_api.v1.auth.utils import auth_user_id
-from limbook_api.v1.image_manager import Image
+from limbook_api.v1.comments import Comment
+from limbook_api.v1.image_manager import Image, post_image
 from limbook_api.v1.posts import Post
 from limbook_api.v1.reacts import React
 
@@ -17,30 +23,228 @@ def validate_post_data(data):
         abort(422)
 
 
+def validate_bulk_post_data(data):
+    validate_post_data(data)
+    # bulk created posts are created without images
+    if data.get('image_ids'):
+        abort(422)
+
+
 def get_images_list_using_ids(image_ids):
-    images = []
-    for image_id in image_ids:
-        image = Image.query.filter(
-            Image.id == image_id,
-            Image.user_id == auth_user_id()
-        ).first_or_404()
+    """ Images of the auth user, loaded with one query
+
+        Parameters:
+            image_ids (list): Ids of images, duplicates are ignored
+
+        Returns:
+            images (list): In the order of image_ids
+
+        Raises:
+            ValidationError: image_ids is not a list of ids, or some ids
+                are not images, or not images of the auth user
+    """
+    # bool is an int too, True would be image 1
+    if not isinstance(image_ids, list) or not all(
+            isinstance(image_id, int) and not isinstance(image_id, bool)
+            for image_id in image_ids):
+        raise ValidationError({'image_ids': 'Must be a list of image ids'})
+
+    image_ids = list(dict.fromkeys(image_ids))
+    found = {
+        image.id: image
+        for image in Image.query.filter(Image.id.in_(image_ids))
+    }
+
+    missing = [image_id for image_id in image_ids if image_id not in found]
+    foreign = [
+        image_id for image_id in image_ids if image_id in found
+        and found[image_id].user_id != auth_user_id()
+    ]
+    if missing or foreign:
+        raise ValidationError({
+            'image_ids': {'missing': missing, 'foreign': foreign}
+        })
+
+    return [found[image_id] for image_id in image_ids]
+
+
+def attach_images(post, images):
+    """ Attach images to a post, Post.images keeps their order
 
-        images.append(image)
+        Parameters:
+            post (Post): Post added to the session
+            images (list): Images in the order they are shown
+    """
+    post.images = images
+    if not images:
+        return
+
+    # the links are inserted by the flush, then numbered with one UPDATE
+    db.session.flush()
+    db.session.execute(
+        post_image.update()
+        .where(post_image.c.post_id == post.id)
+        .values(position=case(
+            {image.id: position for position, image in enumerate(images)},
+            value=post_image.c.image_id
+        ))
+    )
+
+
+# relationships a post list can embed in full with ?include=
+POST_INCLUDES = ('reacts', 'comments')
+
+
+def requested_includes():
+    """ Relationships requested with ?include=reacts,comments """
+    include = request.args.get('include', '').split(',')
+    return tuple(name for name in POST_INCLUDES if name in include)
 
-    return images
 
+def with_post_relations(query, includes=POST_INCLUDES, fields=None):
+    """ Batch load the relationships used to format posts
 
-def filter_posts(count_only=False):
+    Images and the included relationships of all posts in the result are
+    loaded with one extra query each, whatever the number of posts.
+    Relationships left out of the requested fields are not loaded.
+    """
+    relations = ('images',) + tuple(includes)
+    return query.options(*[
+        selectinload(getattr(Post, relation)) for relation in relations
+        if fields is None or relation in fields
+    ])
+
+
+def get_post_or_404(post_id, fields=None):
+    query = with_post_relations(Post.query, fields=fields)
+    # owner is always needed for permission checks
+    query = load_fields(Post, query, fields, required=('user_id',))
+    return query.filter(Post.id == post_id).first_or_404()
+
+
+def filter_posts(count_only=False, validator_only=False):
+    # relationships are loaded by format_post_summaries() for the posts
+    # missing from the fragment cache only
     query = Post.query
 
     # add search filter
     if request.args.get('search_term'):
-        query = query.filter(Post.content.ilike(
-                "%{}%".format(request.args.get('search_term'))
-            ))
+        query = search(Post, query, request.args.get('search_term'))
 
     # return filtered data
-    return filter_model(Post, query, count_only=count_only)
+    return filter_model(
+        Post, query, count_only=count_only, validator_only=validator_only)
+
+
+def requests_viewer_state():
+    """ Whether the requested post summaries depend on the auth user """
+    fields = requested_fields()
+    return fields is None or 'reacted' in fields
+
+
+def get_comment_previews(post_ids, size):
+    """ First comments of each post, loaded with one query
+
+        Parameters:
+            post_ids (list): Ids of posts
+            size (int): Maximum number of comments per post
+
+        Returns:
+            previews (dict): Lists of comments keyed by post id
+    """
+    ranked = db.session.query(
+        Comment.id.label('id'),
+        func.row_number().over(
+            partition_by=Comment.post_id,
+            order_by=(Comment.created_on, Comment.id)
+        ).label('position')
+    ).filter(Comment.post_id.in_(post_ids)).subquery()
+
+    comments = Comment.query.join(ranked, Comment.id == ranked.c.id)\
+        .filter(ranked.c.position <= size)\
+        .order_by(Comment.post_id, ranked.c.position)
+
+    previews = {}
+    for comment in comments:
+        previews.setdefault(comment.post_id, []).append(comment)
+
+    return previews
+
+
+def format_post_summaries(posts, includes=(), fields=None):
+    """ Format posts for lists
+
+    Instead of every react and comment, each post carries its react and
+    comment counts, a preview of its first comments and whether the auth
+    user reacted to it. The counts are columns of the post, the rest is
+    loaded with a fixed number of queries. Relationships listed in
+    includes are embedded in full. Only the requested fields are computed.
+
+    Summaries are kept in the fragment cache, only the posts that missed
+    get their relationships and previews loaded. Whether the auth
+    user reacted differs by user, so it is never cached.
+
+        Parameters:
+            posts (list): Posts to format, relationships need not be loaded
+            includes (tuple): Relationships to embed in full
+            fields (list|None): Names of fields, all when None
+
+        Returns:
+            summaries (list)
+    """
+    def requested(field):
+        return fields is None or field in fields
+
+    def render(missing):
+        post_ids = [post.id for post in missing]
+        # reload the rows of the page with their relationships batch loaded,
+        # keeping the columns the page was loaded with
+        query = load_fields(
+            Post, with_post_relations(Post.query, includes, fields), fields,
+            required=('created_on', 'version'))
+        loaded = {
+            post.id: post for post in
+            query.filter(Post.id.in_(post_ids)).populate_existing()
+        }
+        previews = get_comment_previews(
+            post_ids, current_app.config.get('COMMENT_PREVIEW_SIZE')
+        ) if requested('comments') and 'comments' not in includes else {}
+
+        summaries = []
+        for post_id in post_ids:
+            post = loaded[post_id]
+            summary = post.format_summary(
+                comments=previews.get(post_id, [])
+                if 'comments' not in includes
+                else post.comments if requested('comments') else [],
+                fields=[field for field in fields if field != 'reacted']
+                if fields is not None else None
+            )
+            if 'reacts' in includes and requested('reacts'):
+                summary['reacts'] = [react.format() for react in post.reacts]
+
+            summaries.append(summary)
+
+        return summaries
+
+    summaries = cached_fragments(posts, fragment_variant(
+        'summary', includes, fields,
+        current_app.config.get('COMMENT_PREVIEW_SIZE')
+    ), render)
+
+    if requested('reacted') and summaries:
+        reacted = {
+            post_id for post_id, in db.session.query(React.post_id).filter(
+                React.post_id.in_([post.id for post in posts]),
+                React.user_id == auth_user_id()
+            )
+        }
+        summaries = [
+            dict(summary, reacted=post.id in reacted)
+            for post, summary in zip(posts, summaries)
+        ]
+
+    return summaries
 
 
 def validate_react_data(data):
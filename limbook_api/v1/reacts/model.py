@@ -6,21 +6,24 @@ class React(BaseDbModel):
 
     user_id = db.Column(db.String, nullable=False)
     post_id = db.Column(
-        db.Integer, db.ForeignKey('post.id'),
+        db.Integer, db.ForeignKey('post.id', ondelete="cascade"),
         nullable=False
     )
     post = db.relationship(
-        'Post', backref='reacts', uselist=False,
-        lazy=True
+        'Post', backref=db.backref('reacts', passive_deletes=True),
+        uselist=False, lazy=True
     )
+    # posts are formatted with their reacts
+    touches = ('post',)
+    counters = {'post_id': 'react_count'}
 
     """
-    format()
+    serializers()
         format the data for the api
     """
-    def format(self):
+    def serializers(self):
         return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'post_id': self.post_id,
+            'id': lambda: self.id,
+            'user_id': lambda: self.user_id,
+            'post_id': lambda: self.post_id,
         }
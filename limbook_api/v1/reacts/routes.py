@@ -1,7 +1,10 @@
 from flask import Blueprint, jsonify, abort, request
 
+from limbook_api.db.utils import requested_fields
+from limbook_api.response_cache import conditional_response, \
+    cached_response, invalidates
 from limbook_api.v1.auth.utils import requires_auth, auth_user_id
-from limbook_api.v1.posts import Post
+from limbook_api.v1.posts import get_post_or_404
 from limbook_api.v1.reacts import React, filter_reacts
 
 reacts = Blueprint('reacts', __name__)
@@ -12,25 +15,39 @@ reacts = Blueprint('reacts', __name__)
 # ====================================
 @reacts.route("/posts/<int:post_id>/reacts", methods=['GET'])
 @requires_auth('read:reacts')
+@conditional_response(
+    lambda post_id: filter_reacts(post_id, validator_only=True))
+@cached_response('reacts')
 def get_post_reacts(post_id):
     """ Get all available reacts
 
         Parameters:
              post_id (int): Id of post to which reacts belong to
 
+        Query Parameters:
+             fields (str): Comma separated fields to return
+             after (str): Cursor of the page before
+             before (str): Cursor of the page after
+             total (str): "exact" (default), "estimate" or "none"
+
         Returns:
             success (boolean)
             reacts (list)
-            total (int)
+            next_cursor (str|None)
+            prev_cursor (str|None)
+            total (int|None)
             query_args (dict)
     """
     try:
+        page = filter_reacts(post_id)
         return jsonify({
             'success': True,
             'reacts': [
-                react.format() for react in filter_reacts(post_id)
+                react.format(requested_fields()) for react in page
             ],
-            'total': filter_reacts(post_id, count_only=True),
+            'next_cursor': page.next_cursor,
+            'prev_cursor': page.prev_cursor,
+            'total': page.total,
             'query_args': request.args,
         })
     except Exception as e:
@@ -39,6 +56,7 @@ def get_post_reacts(post_id):
 
 @reacts.route("/posts/<int:post_id>/reacts/toggle", methods=['POST'])
 @requires_auth(['create:reacts', 'update:reacts'])
+@invalidates('reacts')
 def toggle_post_reacts(post_id):
     """ Create new react or delete if exist
 
@@ -49,10 +67,9 @@ def toggle_post_reacts(post_id):
             success (boolean)
             react (list)
     """
-    try:
-
-        post = Post.query.filter(Post.id == post_id).first_or_404()
+    post = get_post_or_404(post_id)
 
+    try:
         user_react = React.query.filter(
             React.post_id == post_id,
             React.user_id == auth_user_id()
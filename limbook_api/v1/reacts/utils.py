@@ -16,11 +16,12 @@ def generate_react(user_id=None, post_id=None):
     return react
 
 
-def filter_reacts(post_id, count_only=False):
+def filter_reacts(post_id, count_only=False, validator_only=False):
     query = React.query
 
     # React always belongs to post
     query = query.filter(React.post_id == post_id)
 
     # return filtered data
-    return filter_model(React, query, count_only=count_only)
+    return filter_model(
+        React, query, count_only=count_only, validator_only=validator_only)
@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify
 
+from limbook_api.v1.auth.token_cache import verified_tokens
 from limbook_api.v1.auth.utils import requires_auth
 from limbook_api.v1.comments import Comment
 from limbook_api.v1.posts import Post
@@ -19,6 +20,7 @@ def get_stats():
         "success": True,
         "stats": {
             "posts": Post.query.count(),
-            "comments": Comment.query.count()
+            "comments": Comment.query.count(),
+            "verified_token_cache": verified_tokens.stats()
         }
     })
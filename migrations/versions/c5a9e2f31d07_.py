@@ -0,0 +1,52 @@
+"""empty message
+
+Revision ID: c5a9e2f31d07
+Revises: b7e41c0d2a58
+Create Date: 2026-10-17 15:26:40.913358
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'c5a9e2f31d07'
+down_revision = 'b7e41c0d2a58'
+branch_labels = None
+depends_on = None
+
+tables = ['comment', 'post']
+search_config = 'pg_catalog.english'
+
+
+def upgrade():
+    for table in tables:
+        op.add_column(
+            table,
+            sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True)
+        )
+        op.execute(
+            "UPDATE " + table + " SET search_vector = to_tsvector('"
+            + search_config + "', coalesce(content, ''))"
+        )
+        op.create_index(
+            op.f('ix_' + table + '_search_vector'), table,
+            ['search_vector'], unique=False, postgresql_using='gin'
+        )
+        op.execute(
+            "CREATE TRIGGER " + table + "_search_vector_update "
+            "BEFORE INSERT OR UPDATE OF content ON " + table + " "
+            "FOR EACH ROW EXECUTE PROCEDURE tsvector_update_trigger("
+            "search_vector, '" + search_config + "', content)"
+        )
+
+
+def downgrade():
+    for table in tables:
+        op.execute(
+            "DROP TRIGGER IF EXISTS " + table + "_search_vector_update "
+            "ON " + table
+        )
+        op.drop_index(
+            op.f('ix_' + table + '_search_vector'), table_name=table)
+        op.drop_column(table, 'search_vector')
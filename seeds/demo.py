@@ -4,9 +4,10 @@ from faker import Faker as Generator
 from flask_seeder import Seeder
 
 from limbook_api.db import db_drop_and_create_all
+from limbook_api.v1.auth import generate_user
 from limbook_api.v1.comments import generate_comment
 from limbook_api.v1.image_manager import generate_image
-from limbook_api.v1.posts import generate_post, Post
+from limbook_api.v1.posts import generate_post, Post, autocomplete_index
 from limbook_api.v1.reacts import generate_react
 from run import app
 
@@ -19,6 +20,16 @@ class DemoSeeder(Seeder):
     def run(self):
         db_drop_and_create_all()
 
+        # ====================================================
+        # Generate users when they are managed in the database
+        # ====================================================
+        if app.config.get('AUTH_DRIVER') == 'database':
+            generate_user(email='admin@gmail.com', role='admin')
+            generate_user(email='verified_user@gmail.com', role='user')
+            generate_user(
+                email='unverified_user@gmail.com', role='unverified_user')
+            print('Generated users')
+
         # ====================================================
         # Generate posts for test user
         # ====================================================
@@ -67,6 +78,12 @@ class DemoSeeder(Seeder):
 
             print('Generated reacts for posts')
 
+        # ====================================================
+        # Index posts for search autocomplete
+        # ====================================================
+        autocomplete_index.rebuild(Post.query.yield_per(1000))
+        print('Indexed posts for autocomplete')
+
 
 # Make the tests conveniently executable
 if __name__ == "__main__":
@@ -1,10 +1,22 @@
 import os
 import shutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
 from unittest import TestCase
 
+from Crypto.PublicKey import RSA
+from flask import json
+from jose import jwt
+from jose.utils import base64url_encode
+from sqlalchemy import event
+
 from config_test import TestConfig
-from limbook_api import create_app
-from limbook_api.db import db_drop_and_create_all
+from limbook_api import create_app, cache
+from limbook_api.db import db, db_drop_and_create_all
+from limbook_api.v1.auth import jwks_store, verified_tokens, \
+    token_blacklist, rate_limiter
+from limbook_api.v1.posts import autocomplete_index
 
 test_user_id = "auth0|test_user_id"
 api_base = '/v1'
@@ -38,6 +50,112 @@ def header_with_token(token):
     return {'Authorization': 'Bearer ' + token}
 
 
+def generate_signing_key(kid):
+    """ Generate an RSA key pair like the ones Auth0 signs tokens with.
+
+        Returns:
+            private_key (string): PEM encoded private key
+            jwk (dict): Public key as published in a JWKS
+    """
+    def encode_int(value):
+        return base64url_encode(
+            value.to_bytes((value.bit_length() + 7) // 8, 'big')
+        ).decode()
+
+    key = RSA.generate(2048)
+    return key.exportKey().decode(), {
+        'kty': 'RSA',
+        'kid': kid,
+        'use': 'sig',
+        'alg': 'RS256',
+        'n': encode_int(key.n),
+        'e': encode_int(key.e)
+    }
+
+
+def mint_token(private_key, kid, permissions=None, sub=test_user_id,
+               expires_in=600):
+    """ Sign a token the way Auth0 would for the test config """
+    now = int(time.time())
+    return jwt.encode(
+        {
+            'iss': 'https://' + TestConfig.AUTH0_DOMAIN + '/',
+            'aud': TestConfig.API_AUDIENCE,
+            'sub': sub,
+            'iat': now,
+            'exp': now + expires_in,
+            'permissions': permissions if permissions else []
+        },
+        private_key,
+        algorithm='RS256',
+        headers={'kid': kid}
+    )
+
+
+class QueryCounter:
+    """ Count and keep the sql statements executed inside a with block """
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def on_execute(self, conn, cursor, statement, *args):
+        self.count += 1
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(db.engine, 'before_cursor_execute', self.on_execute)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(db.engine, 'before_cursor_execute', self.on_execute)
+
+
+class JwksStubServer:
+    """ Local stand-in for the identity provider's JWKS endpoint.
+
+    Set "keys" to rotate keys and "available" to simulate an outage.
+    """
+
+    def __init__(self, keys=None):
+        self.keys = keys if keys else []
+        self.available = True
+        self.request_count = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.request_count += 1
+                if not stub.available:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+
+                body = json.dumps({'keys': stub.keys}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}/.well-known/jwks.json'.format(
+            self.server.server_port)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
 class BaseTestCase(TestCase):
     """This class represents the test case for Activities"""
 
@@ -50,6 +168,17 @@ class BaseTestCase(TestCase):
         self.client = client
         # refresh database
         db_drop_and_create_all()
+        # forget signing keys and tokens cached by previous tests
+        jwks_store.clear()
+        verified_tokens.clear()
+        token_blacklist.clear()
+        rate_limiter.clear()
+        autocomplete_index.clear()
+        cache.clear()
+
+    def as_json(self, data):
+        """ Data as the api encodes it, e.g. datetimes as strings """
+        return json.loads(json.dumps(data, app=self.app))
 
     def tearDown(self):
         """Executed after reach test"""
@@ -1,5 +1,10 @@
-from unittest import main
+from datetime import datetime
+from unittest import main, mock
 
+from flask import json
+from werkzeug.datastructures import MultiDict
+
+from limbook_api import encoder
 from tests.base import BaseTestCase
 
 
@@ -15,6 +20,30 @@ class AppTestCase(BaseTestCase):
         self.assertEqual(res.status_code, 200)
         self.assertTrue("Welcome to Limbook Api" in res.get_data(as_text=True))
 
+    # JSON encoder ----------------------------------------
+    def test_encoders_write_the_same_json(self):
+        # given
+        data = {
+            'created_on': datetime(2020, 5, 1, 12, 30, 15, 250),
+            'query_args': MultiDict([('page', '1'), ('page', '2')]),
+            'ids': (1, 2),
+            'content': 'Café'
+        }
+
+        # encode
+        fast = json.dumps(data, app=self.app)
+        with mock.patch.object(encoder, 'orjson', None):
+            fallback = json.dumps(data, app=self.app)
+
+        # assert
+        self.assertEqual(json.loads(fast), json.loads(fallback))
+        self.assertEqual(json.loads(fast), {
+            'created_on': '2020-05-01T12:30:15.000250',
+            'query_args': {'page': '1'},
+            'ids': [1, 2],
+            'content': 'Café'
+        })
+
 
 # Make the tests conveniently executable
 if __name__ == "__main__":
@@ -0,0 +1,101 @@
+from unittest import main
+
+from sqlalchemy import event
+
+from limbook_api.db import db, unit_of_work, after_commit, \
+    reconcile_counts
+from limbook_api.v1.comments import generate_comment, Comment
+from limbook_api.v1.posts import Post, generate_post
+from limbook_api.v1.reacts import generate_react
+from tests.base import BaseTestCase, test_user_id
+
+
+class CommitCounter:
+    """ Count the commits of the session inside a with block """
+
+    def __init__(self):
+        self.count = 0
+
+    def on_commit(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(db.session, 'after_commit', self.on_commit)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(db.session, 'after_commit', self.on_commit)
+
+
+class DbTestCase(BaseTestCase):
+    """This class represents the test cases of the db helpers"""
+
+    # Unit of work ----------------------------------------
+    def test_unit_of_work_commits_once(self):
+        # write
+        with CommitCounter() as counter:
+            with unit_of_work():
+                Post(content='First', user_id=test_user_id).insert()
+                with unit_of_work():
+                    Post(content='Second', user_id=test_user_id).add()
+
+        # assert
+        self.assertEqual(counter.count, 1)
+        self.assertEqual(Post.query.count(), 2)
+
+    def test_unit_of_work_rolls_back_on_error(self):
+        # given
+        called = []
+
+        # write
+        with self.assertRaises(ValueError):
+            with unit_of_work():
+                Post(content='First', user_id=test_user_id).insert()
+                after_commit(lambda: called.append(True))
+                raise ValueError()
+
+        # assert
+        self.assertEqual(Post.query.count(), 0)
+        self.assertEqual(called, [])
+
+    def test_after_commit_runs_once_committed(self):
+        # given
+        called = []
+
+        # write
+        with unit_of_work():
+            after_commit(lambda: called.append(True))
+            Post(content='First', user_id=test_user_id).add()
+            self.assertEqual(called, [])
+
+        # assert
+        self.assertEqual(called, [True])
+
+    # Counters ----------------------------------------
+    def test_reconcile_counts_repairs_drifted_counters(self):
+        # given
+        post_id = generate_post().id
+        comment_id = generate_comment(post_id=post_id).id
+        generate_react(post_id=post_id)
+        generate_react(post_id=post_id)
+        db.session.execute(
+            Post.__table__.update().values(react_count=7, comment_count=0))
+        db.session.execute(
+            Comment.__table__.update().values(reply_count=3))
+        db.session.commit()
+
+        # repair
+        repaired = reconcile_counts()
+        post = Post.query.get(post_id)
+
+        # assert
+        self.assertEqual(repaired, 3)
+        self.assertEqual(post.react_count, 2)
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(Comment.query.get(comment_id).reply_count, 0)
+        self.assertEqual(reconcile_counts(), 0)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,50 @@
+import io
+import os
+import tempfile
+import threading
+import time
 from unittest import main
+from unittest.mock import patch
 
-from flask import json
+from flask import json, jsonify
+from redis import Redis
 
-from tests.base import BaseTestCase, api_base
+from config_test import TestConfig
+from limbook_api import create_app
+from limbook_api.v1.auth import jwks_store, verified_tokens, \
+    blacklist_token, blacklist_token_once, check_password, requires_auth, \
+    auth_user_id, PermissionRegistry, has_permission, is_token_blacklisted, \
+    BloomFilter, TokenBlacklist, generate_user
+from tests.base import BaseTestCase, api_base, generate_signing_key, \
+    mint_token, JwksStubServer, test_user_id
+
+signing_keys = {
+    kid: generate_signing_key(kid) for kid in ['key-1', 'key-2']
+}
+
+
+def fake_jwks_response(*kids):
+    """ Build a urlopen replacement serving a JWKS with the given kids """
+    document = {
+        'keys': [
+            {'kty': 'RSA', 'kid': kid, 'use': 'sig', 'n': 'n', 'e': 'AQAB'}
+            for kid in kids
+        ]
+    }
+
+    def fake_urlopen(url, timeout=None):
+        return io.BytesIO(json.dumps(document).encode())
+
+    return fake_urlopen
+
+
+def fake_claims(token, exp_in=60, permissions=None):
+    """ Claims a verified token would carry """
+    return {
+        'sub': 'auth0|' + token,
+        'exp': int(time.time()) + exp_in,
+        'permissions': permissions if permissions else ['read:secure_route']
+    }
 
 
 class AuthTestCase(BaseTestCase):
@@ -99,6 +141,587 @@ class AuthTestCase(BaseTestCase):
         # assert
         self.assertEqual(res.status_code, 200)
 
+    # JWKS Tests ----------------------------------------
+    def test_jwks_is_fetched_once_for_known_keys(self):
+        with self.app.app_context(), patch(
+                'limbook_api.v1.auth.jwks.urlopen',
+                side_effect=fake_jwks_response('key-1')) as urlopen:
+            for i in range(0, 5):
+                self.assertEqual(
+                    jwks_store.get_key('key-1').get('kid'), 'key-1')
+
+            # assert
+            self.assertEqual(urlopen.call_count, 1)
+
+    def test_jwks_unknown_kid_refetch_is_rate_limited(self):
+        with self.app.app_context(), patch(
+                'limbook_api.v1.auth.jwks.urlopen',
+                side_effect=fake_jwks_response('key-1')) as urlopen:
+            jwks_store.get_key('key-1')
+            for i in range(0, 5):
+                self.assertIsNone(jwks_store.get_key('unknown'))
+
+            # assert
+            self.assertEqual(urlopen.call_count, 1)
+
+    def test_jwks_unknown_kid_refreshes_early_for_rotated_keys(self):
+        self.app.config['JWKS_MIN_REFETCH_INTERVAL'] = 0
+        with self.app.app_context():
+            with patch('limbook_api.v1.auth.jwks.urlopen',
+                       side_effect=fake_jwks_response('key-1')):
+                jwks_store.get_key('key-1')
+
+            # keys are rotated by the identity provider
+            with patch('limbook_api.v1.auth.jwks.urlopen',
+                       side_effect=fake_jwks_response('key-2')) as urlopen:
+                key = jwks_store.get_key('key-2')
+
+            # assert
+            self.assertEqual(urlopen.call_count, 1)
+            self.assertEqual(key.get('kid'), 'key-2')
+
+    def test_jwks_is_refetched_after_ttl(self):
+        self.app.config['JWKS_CACHE_TTL'] = 0
+        with self.app.app_context(), patch(
+                'limbook_api.v1.auth.jwks.urlopen',
+                side_effect=fake_jwks_response('key-1')) as urlopen:
+            jwks_store.get_key('key-1')
+            jwks_store.get_key('key-1')
+
+            # assert
+            self.assertEqual(urlopen.call_count, 2)
+
+    def test_jwks_keeps_known_keys_when_refresh_fails(self):
+        self.app.config['JWKS_CACHE_TTL'] = 0
+        with self.app.app_context():
+            with patch('limbook_api.v1.auth.jwks.urlopen',
+                       side_effect=fake_jwks_response('key-1')):
+                jwks_store.get_key('key-1')
+
+            with patch('limbook_api.v1.auth.jwks.urlopen',
+                       side_effect=OSError('unreachable')):
+                key = jwks_store.get_key('key-1')
+
+            # assert
+            self.assertEqual(key.get('kid'), 'key-1')
+
+    # Verified Token Cache Tests ----------------------------------------
+    def test_repeated_token_is_verified_once(self):
+        with patch('limbook_api.v1.auth.utils.verify_decode_jwt',
+                   side_effect=fake_claims) as verify:
+            for i in range(0, 3):
+                res = self.client().get(
+                    api_base + '/secure-route',
+                    headers={'Authorization': 'Bearer token-a'}
+                )
+                self.assertEqual(res.status_code, 200)
+
+        # assert
+        self.assertEqual(verify.call_count, 1)
+        self.assertEqual(verified_tokens.hits, 2)
+        self.assertEqual(verified_tokens.misses, 1)
+
+    def test_expired_token_is_not_served_from_cache(self):
+        with patch('limbook_api.v1.auth.utils.verify_decode_jwt',
+                   side_effect=lambda t: fake_claims(t, exp_in=0)) as verify:
+            for i in range(0, 2):
+                self.client().get(
+                    api_base + '/secure-route',
+                    headers={'Authorization': 'Bearer token-a'}
+                )
+
+        # assert
+        self.assertEqual(verify.call_count, 2)
+        self.assertEqual(verified_tokens.hits, 0)
+
+    def test_blacklisted_token_is_rejected_even_when_cached(self):
+        headers = {'Authorization': 'Bearer token-a'}
+        with patch('limbook_api.v1.auth.utils.verify_decode_jwt',
+                   side_effect=fake_claims):
+            self.client().get(api_base + '/secure-route', headers=headers)
+            with self.app.app_context():
+                blacklist_token('token-a')
+            res = self.client().get(
+                api_base + '/secure-route', headers=headers)
+        data = json.loads(res.data)
+
+        # assert
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(data.get('error_code'), 'token_revoked')
+
+    # Blacklist Tests ----------------------------------------
+    def test_bloom_filter_has_no_false_negatives(self):
+        # given
+        bloom = BloomFilter(1000, 0.01)
+        items = ['token-' + str(i) for i in range(0, 1000)]
+        for item in items:
+            bloom.add(item)
+
+        # assert
+        self.assertTrue(all(item in bloom for item in items))
+        false_positives = sum(
+            1 for i in range(0, 1000) if 'other-' + str(i) in bloom)
+        self.assertLess(false_positives, 50)
+
+    def test_blacklisted_token_is_revoked(self):
+        with self.app.app_context():
+            blacklist_token('token-a')
+
+            # assert
+            self.assertTrue(is_token_blacklisted('token-a'))
+            self.assertFalse(is_token_blacklisted('token-b'))
+
+    def test_expired_revocations_are_dropped(self):
+        # given
+        blacklist = TokenBlacklist(None)
+
+        # revoke
+        with self.app.app_context():
+            blacklist.revoke('token-a', 0.01)
+            time.sleep(0.02)
+            blacklist.revoke('token-b', 60)
+
+        # assert
+        self.assertEqual(len(blacklist.local), 1)
+
+    def test_unreachable_redis_is_retried_after_an_interval(self):
+        # given
+        self.app.config['USE_REDIS'] = True
+        self.app.config['BLACKLIST_SYNC_RETRY_INTERVAL'] = 60
+        blacklist = TokenBlacklist(Redis(port=1, socket_connect_timeout=0.1))
+
+        # check and revoke tokens while redis is down
+        with self.app.app_context():
+            with patch.object(self.app.logger, 'exception') as logged:
+                blacklist.revoke('token-a', 60)
+                results = [
+                    blacklist.is_revoked(token)
+                    for token in ['token-a', 'token-b', 'token-c']
+                ]
+
+        # assert
+        self.assertEqual(results, [True, False, False])
+        self.assertEqual(logged.call_count, 1)
+
+    # Permission Tests ----------------------------------------
+    def test_permission_masks_match_any_required_permission(self):
+        # given
+        registry = PermissionRegistry(['read:posts', 'create:posts'])
+        granted = registry.mask(['read:posts', 'update:reacts'])
+
+        # assert
+        self.assertTrue(has_permission(registry.mask(''), granted))
+        self.assertTrue(has_permission(registry.mask('read:posts'), granted))
+        self.assertTrue(has_permission(
+            registry.mask(['create:reacts', 'update:reacts']), granted))
+        self.assertFalse(has_permission(
+            registry.mask('create:posts'), granted))
+        self.assertFalse(has_permission(
+            registry.mask('read:posts'), registry.mask([])))
+
+    def test_permission_mask_is_cached_with_verified_token(self):
+        headers = {'Authorization': 'Bearer token-a'}
+        with patch('limbook_api.v1.auth.utils.verify_decode_jwt',
+                   side_effect=fake_claims):
+            self.client().get(api_base + '/secure-route', headers=headers)
+
+        with patch('limbook_api.v1.auth.utils.permission_mask') as mask:
+            res = self.client().get(
+                api_base + '/secure-route', headers=headers)
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        mask.assert_not_called()
+
+    # Request Context Tests ----------------------------------------
+    def test_concurrent_requests_see_their_own_user(self):
+        # given
+        tokens = ['token-' + str(i) for i in range(0, 4)]
+        barrier = threading.Barrier(len(tokens), timeout=5)
+
+        @requires_auth()
+        def whoami():
+            # every request authenticates before any of them reads the user
+            barrier.wait()
+            return jsonify({'user_id': auth_user_id()})
+
+        self.app.add_url_rule('/whoami', 'whoami', whoami)
+        results = {}
+
+        def make_request(token):
+            res = self.client().get(
+                '/whoami', headers={'Authorization': 'Bearer ' + token})
+            results[token] = json.loads(res.data).get('user_id')
+
+        # make interleaved requests
+        with patch('limbook_api.v1.auth.utils.verify_decode_jwt',
+                   side_effect=fake_claims):
+            threads = [
+                threading.Thread(target=make_request, args=(token,))
+                for token in tokens
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        # assert
+        for token in tokens:
+            self.assertEqual(results.get(token), 'auth0|' + token)
+
+    # Database Driver Tests ----------------------------------------
+    def login(self, email, password):
+        return self.client().post(
+            api_base + '/auth/login',
+            json={'email': email, 'password': password}
+        )
+
+    def test_login_is_disabled_for_auth0_driver(self):
+        # make request
+        res = self.login('admin@gmail.com', 'password')
+
+        # assert
+        self.assertEqual(res.status_code, 404)
+
+    def test_cannot_login_with_invalid_credentials(self):
+        # given
+        self.app.config['AUTH_DRIVER'] = 'database'
+        with self.app.app_context():
+            generate_user(email='admin@gmail.com', role='admin')
+
+        # make request
+        res = self.login('admin@gmail.com', 'wrong password')
+        data = json.loads(res.data)
+
+        # assert
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(data.get('error_code'), 'invalid_credentials')
+
+    def test_unknown_email_takes_a_password_check(self):
+        # given
+        self.app.config['AUTH_DRIVER'] = 'database'
+
+        # make request
+        with patch('limbook_api.v1.auth.database_driver.check_password',
+                   wraps=check_password) as checked:
+            res = self.login('nobody@gmail.com', 'password')
+
+        # assert
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(checked.call_count, 1)
+
+    def test_login_is_rate_limited_per_client(self):
+        # given
+        self.app.config['AUTH_DRIVER'] = 'database'
+        self.app.config['RATE_LIMITS'] = {
+            'default': (60, 10),
+            'auth:login': (2, 0.001)
+        }
+
+        # make requests
+        statuses = [
+            self.login('nobody@gmail.com', 'password').status_code
+            for i in range(0, 3)
+        ]
+
+        # assert
+        self.assertEqual(statuses, [401, 401, 429])
+
+    def test_login_is_rate_limited_per_client_behind_proxy(self):
+        # given
+        class ProxiedConfig(TestConfig):
+            TRUSTED_PROXIES = 1
+            AUTH_DRIVER = 'database'
+            RATE_LIMITS = {
+                'default': (60, 10),
+                'auth:login': (1, 0.001)
+            }
+        client = create_app(ProxiedConfig).test_client()
+
+        def login(address):
+            return client.post(
+                api_base + '/auth/login',
+                json={'email': 'nobody@gmail.com', 'password': 'password'},
+                headers={'X-Forwarded-For': address}
+            ).status_code
+
+        # make requests
+        statuses = [login('1.1.1.1'), login('1.1.1.1'), login('2.2.2.2')]
+
+        # assert
+        self.assertEqual(statuses, [401, 429, 401])
+
+    def test_can_access_protected_route_with_database_token(self):
+        # given
+        self.app.config['AUTH_DRIVER'] = 'database'
+        with self.app.app_context():
+            generate_user(email='admin@gmail.com', role='admin')
+
+        # login
+        res = self.login('admin@gmail.com', 'password')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+
+        # make request
+        with patch('limbook_api.v1.auth.utils.verify_decode_jwt') as auth0:
+            res = self.client().get(
+                api_base + '/stats',
+                headers={
+                    'Authorization': 'Bearer ' + data.get('access_token')
+                }
+            )
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        auth0.assert_not_called()
+
+    def test_refresh_token_can_be_used_once(self):
+        # given
+        self.app.config['AUTH_DRIVER'] = 'database'
+        with self.app.app_context():
+            generate_user(email='user@gmail.com', role='user')
+        tokens = json.loads(self.login('user@gmail.com', 'password').data)
+
+        # refresh
+        res = self.client().post(
+            api_base + '/auth/refresh',
+            json={'refresh_token': tokens.get('refresh_token')}
+        )
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(
+            data.get('refresh_token'), tokens.get('refresh_token'))
+
+        # refresh again with the same token
+        res = self.client().post(
+            api_base + '/auth/refresh',
+            json={'refresh_token': tokens.get('refresh_token')}
+        )
+
+        # assert
+        self.assertEqual(res.status_code, 401)
+
+    def test_concurrent_refreshes_use_the_token_once(self):
+        # given
+        results = []
+
+        def refresh():
+            with self.app.app_context():
+                results.append(blacklist_token_once('refresh-token'))
+
+        # make concurrent requests
+        threads = [threading.Thread(target=refresh) for i in range(0, 10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # assert
+        self.assertEqual(sorted(results), [False] * 9 + [True])
+
+    def test_refresh_token_cannot_be_used_as_access_token(self):
+        # given
+        self.app.config['AUTH_DRIVER'] = 'database'
+        with self.app.app_context():
+            generate_user(email='admin@gmail.com', role='admin')
+        tokens = json.loads(self.login('admin@gmail.com', 'password').data)
+
+        # make request
+        res = self.client().get(
+            api_base + '/stats',
+            headers={
+                'Authorization': 'Bearer ' + tokens.get('refresh_token')
+            }
+        )
+        data = json.loads(res.data)
+
+        # assert
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(data.get('error_code'), 'invalid_token_type')
+
+
+class JwksRefreshTestCase(BaseTestCase):
+    """Signing keys served by a local stand-in of the identity provider"""
+
+    def setUp(self):
+        super().setUp()
+        self.jwks_server = JwksStubServer(
+            keys=[signing_keys['key-1'][1]]).start()
+        self.app.config['JWKS_URL'] = self.jwks_server.url
+        self.app.config['JWKS_MIN_REFETCH_INTERVAL'] = 0
+
+    def tearDown(self):
+        jwks_store.stop_refresher()
+        self.jwks_server.stop()
+        super().tearDown()
+
+    def request_with_key(self, kid):
+        # make every request verify its token against the key store
+        verified_tokens.clear()
+        token = mint_token(
+            signing_keys[kid][0], kid, permissions=['read:secure_route'])
+        return self.client().get(
+            api_base + '/secure-route',
+            headers={'Authorization': 'Bearer ' + token}
+        )
+
+    def test_can_access_protected_route_with_signed_token(self):
+        # make request
+        res = self.request_with_key('key-1')
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.jwks_server.request_count, 1)
+
+    def test_rotated_keys_are_picked_up(self):
+        # given
+        self.request_with_key('key-1')
+
+        # rotate keys
+        self.jwks_server.keys = [signing_keys['key-2'][1]]
+        res = self.request_with_key('key-2')
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.jwks_server.request_count, 2)
+
+    def test_last_known_keys_are_served_during_outage(self):
+        # given
+        self.app.config['JWKS_CACHE_TTL'] = 0
+        self.app.config['JWKS_BREAKER_THRESHOLD'] = 2
+        self.request_with_key('key-1')
+
+        # identity provider goes down
+        self.jwks_server.available = False
+        for i in range(0, 5):
+            res = self.request_with_key('key-1')
+            self.assertEqual(res.status_code, 200)
+
+        # assert breaker stopped fetching after two failures
+        self.assertEqual(self.jwks_server.request_count, 3)
+
+    def test_keys_are_fetched_again_after_recovery(self):
+        # given
+        self.app.config['JWKS_BREAKER_THRESHOLD'] = 1
+        self.app.config['JWKS_BREAKER_COOLDOWN'] = 0.2
+        self.request_with_key('key-1')
+        self.jwks_server.available = False
+        self.jwks_server.keys = [signing_keys['key-2'][1]]
+        res = self.request_with_key('key-2')
+        self.assertEqual(res.status_code, 400)
+
+        # identity provider recovers
+        self.jwks_server.available = True
+        time.sleep(0.3)
+        res = self.request_with_key('key-2')
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+
+    def test_unavailable_jwks_without_known_keys(self):
+        # given
+        self.jwks_server.available = False
+
+        # make request
+        res = self.request_with_key('key-1')
+        data = json.loads(res.data)
+
+        # assert
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(data.get('error_code'), 'jwks_unavailable')
+
+    def test_new_worker_starts_with_snapshot_keys(self):
+        # given
+        snapshot_dir = tempfile.mkdtemp()
+        self.app.config['JWKS_SNAPSHOT_PATH'] = os.path.join(
+            snapshot_dir, 'jwks.json')
+        self.request_with_key('key-1')
+
+        # a new worker boots while the identity provider is down
+        jwks_store.clear()
+        self.jwks_server.available = False
+        jwks_store.init_app(self.app)
+        res = self.request_with_key('key-1')
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.jwks_server.request_count, 1)
+
+    def write_snapshot(self, fetched_at, url=None, mode=0o600):
+        """ Save a snapshot holding key-2, which the server doesn't serve """
+        path = os.path.join(tempfile.mkdtemp(), 'jwks.json')
+        with open(path, 'w') as f:
+            json.dump({
+                'url': url if url else self.jwks_server.url,
+                'fetched_at': fetched_at,
+                'jwks': {'keys': [signing_keys['key-2'][1]]}
+            }, f)
+        os.chmod(path, mode)
+        self.app.config['JWKS_SNAPSHOT_PATH'] = path
+        jwks_store.clear()
+        jwks_store.init_app(self.app)
+
+    def test_snapshot_is_saved_for_the_app_user_only(self):
+        # given
+        snapshot_dir = tempfile.mkdtemp()
+        path = os.path.join(snapshot_dir, 'jwks.json')
+        self.app.config['JWKS_SNAPSHOT_PATH'] = path
+
+        # make request
+        self.request_with_key('key-1')
+
+        # assert
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+
+    def test_untrusted_snapshots_are_ignored(self):
+        for snapshot in [
+            # writable by other users
+            {'fetched_at': time.time(), 'mode': 0o666},
+            # keys of another identity provider
+            {'fetched_at': time.time(), 'url': 'https://evil/jwks.json'},
+            # older than JWKS_CACHE_TTL
+            {'fetched_at': time.time() - 2 * 60 * 60},
+        ]:
+            self.write_snapshot(**snapshot)
+
+            # assert
+            self.assertEqual(jwks_store.keys, {})
+
+    def test_snapshot_from_the_future_is_refreshed(self):
+        # given
+        self.app.config['JWKS_CACHE_TTL'] = 1
+        self.write_snapshot(fetched_at=time.time() + 10 ** 9)
+        self.assertIn('key-2', jwks_store.keys)
+
+        # make request once the ttl is over
+        time.sleep(1.1)
+        res = self.request_with_key('key-1')
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.jwks_server.request_count, 1)
+        self.assertNotIn('key-2', jwks_store.keys)
+
+    def test_background_refresher_keeps_keys_fresh(self):
+        # given
+        self.app.config['JWKS_BACKGROUND_REFRESH'] = True
+        self.app.config['JWKS_REFRESH_INTERVAL'] = 0.1
+        self.app.config['JWKS_MIN_REFETCH_INTERVAL'] = 60
+        jwks_store.init_app(self.app)
+        self.request_with_key('key-1')
+
+        # rotate keys and let the refresher notice
+        self.jwks_server.keys = [signing_keys['key-2'][1]]
+        time.sleep(0.5)
+        jwks_store.stop_refresher()
+        time.sleep(0.2)
+        request_count = self.jwks_server.request_count
+        res = self.request_with_key('key-2')
+
+        # assert key was known without fetching in the request
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.jwks_server.request_count, request_count)
+
 
 # Make the tests conveniently executable
 if __name__ == "__main__":
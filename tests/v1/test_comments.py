@@ -2,9 +2,10 @@ from unittest import main
 
 from flask import json
 
-from limbook_api.v1.comments import generate_comment
-from limbook_api.v1.posts import generate_post
-from tests.base import BaseTestCase, test_user_id, api_base, pagination_limit
+from limbook_api.v1.comments import generate_comment, Comment
+from limbook_api.v1.posts import generate_post, Post
+from tests.base import BaseTestCase, test_user_id, api_base, \
+    pagination_limit, QueryCounter
 
 
 class CommentsTestCase(BaseTestCase):
@@ -45,6 +46,56 @@ class CommentsTestCase(BaseTestCase):
         self.assertEqual(data.get('total'), 25)
         self.assertEqual(len(data.get('query_args')), 3)
 
+    def test_get_comments_with_fields(self):
+        # given
+        post = generate_post()
+        generate_comment(user_id=test_user_id, post_id=post.id)
+
+        # make request
+        res = self.client().get(
+            api_base
+            + '/comments'
+            + '?mock_token_verification=True&permission=read:comments'
+            + '&fields=id,content'
+        )
+        data = json.loads(res.data)
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            sorted(data.get('comments')[0].keys()), ['content', 'id'])
+
+    def test_comments_are_cached_until_a_comment_is_written(self):
+        # given
+        post = generate_post()
+        generate_comment(post_id=post.id)
+
+        def get_comments():
+            res = self.client().get(
+                api_base
+                + '/comments'
+                + '?mock_token_verification=True&permission=read:comments'
+                + '&post_id=' + str(post.id)
+            )
+            return json.loads(res.data).get('total')
+
+        first = get_comments()
+        # only the etag validator runs, the page comes from the cache
+        with QueryCounter() as counter:
+            cached = get_comments()
+        self.client().post(
+            api_base
+            + '/comments'
+            + '?mock_token_verification=True&permission=create:comments',
+            json={'post_id': post.id, 'content': 'My new Comment'}
+        )
+
+        # assert
+        self.assertEqual(first, 1)
+        self.assertEqual(cached, 1)
+        self.assertEqual(counter.count, 1)
+        self.assertEqual(get_comments(), 2)
+
     # Get Comment Tests ----------------------------------------
     def test_cannot_get_comment_without_correct_permission(self):
         # get comments
@@ -114,6 +165,82 @@ class CommentsTestCase(BaseTestCase):
         self.assertEqual(
             data.get('comment').get('post_id'), post_id)
 
+    def test_can_bulk_create_comments(self):
+        # given
+        post_id = generate_post().id
+        comments = [
+            {"post_id": post_id, "content": "First"},
+            {"post_id": post_id},
+            {"post_id": 100, "content": "Comment of missing post"},
+            {"post_id": post_id, "content": "Second"}
+        ]
+
+        # make request
+        res = self.client().post(
+            api_base
+            + '/comments/bulk'
+            + '?mock_token_verification=True&permission=create:comments',
+            json={'comments': comments}
+        )
+        data = json.loads(res.data)
+        results = data.get('results')
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data.get('created'), 2)
+        self.assertEqual(results[0].get('comment').get('content'), 'First')
+        self.assertEqual(results[1].get('error'), 422)
+        self.assertEqual(results[2].get('error'), 404)
+        self.assertEqual(results[3].get('comment').get('content'), 'Second')
+        self.assertEqual(
+            results[3].get('comment').get('user_id'), test_user_id)
+        self.assertEqual(Post.query.get(post_id).comment_count, 2)
+
+    def test_bulk_create_comments_reads_post_ids_like_single_create(self):
+        # given
+        post_id = generate_post().id
+        comments = [
+            {"post_id": str(post_id), "content": "Comment"},
+            {"post_id": "first", "content": "Comment of missing post"}
+        ]
+
+        # make request
+        res = self.client().post(
+            api_base
+            + '/comments/bulk'
+            + '?mock_token_verification=True&permission=create:comments',
+            json={'comments': comments}
+        )
+        data = json.loads(res.data)
+        results = data.get('results')
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data.get('created'), 1)
+        self.assertEqual(results[0].get('comment').get('post_id'), post_id)
+        self.assertEqual(results[1].get('error'), 404)
+        self.assertEqual(Post.query.get(post_id).comment_count, 1)
+
+    def test_cannot_bulk_create_more_comments_than_limit(self):
+        # given
+        post_id = generate_post().id
+        comments = [
+            {"post_id": post_id, "content": "Comment"}
+            for i in range(0, self.app.config.get('BULK_CREATE_LIMIT') + 1)
+        ]
+
+        # make request
+        res = self.client().post(
+            api_base
+            + '/comments/bulk'
+            + '?mock_token_verification=True&permission=create:comments',
+            json={'comments': comments}
+        )
+
+        # assert
+        self.assertEqual(res.status_code, 413)
+        self.assertEqual(Comment.query.count(), 0)
+
     def test_cannot_reply_comment_without_correct_permission(self):
         # reply comment
         res = self.client().post(
@@ -312,6 +439,42 @@ class CommentsTestCase(BaseTestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data.get('deleted_id'), comment.id)
 
+    def test_comment_counts_follow_replies_and_deletes(self):
+        # given
+        post_id = generate_post().id
+        comment_id = generate_comment(
+            user_id=test_user_id,
+            post_id=post_id
+        ).id
+        other_id = generate_comment(post_id=post_id).id
+
+        # reply to comment
+        for content in ('First reply', 'Second reply'):
+            res = self.client().post(
+                api_base
+                + '/comments/' + str(comment_id) + '/replies'
+                + '?mock_token_verification=True&permission=create:comments',
+                json={'content': content}
+            )
+            self.assertEqual(res.status_code, 200)
+
+        # assert
+        self.assertEqual(Post.query.get(post_id).comment_count, 4)
+        self.assertEqual(Comment.query.get(comment_id).reply_count, 2)
+        self.assertEqual(Comment.query.get(other_id).reply_count, 0)
+
+        # delete comment, its replies are deleted with it
+        res = self.client().delete(
+            api_base
+            + '/comments/' + str(comment_id)
+            + '?mock_token_verification=True&permission=delete:comments'
+        )
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(Comment.query.filter_by(post_id=post_id).count(), 1)
+        self.assertEqual(Post.query.get(post_id).comment_count, 1)
+
 
 # Make the tests conveniently executable
 if __name__ == "__main__":
@@ -3,8 +3,11 @@ import os
 from unittest import main
 
 from flask import json
+from sqlalchemy import select
 
-from limbook_api.v1.image_manager import generate_img_in_bytes, generate_image
+from limbook_api.db import db
+from limbook_api.v1.image_manager import generate_img_in_bytes, \
+    generate_image, post_image
 from limbook_api.v1.posts import generate_post
 from tests.base import BaseTestCase, test_user_id, api_base, pagination_limit
 
@@ -139,7 +142,7 @@ class ImageManagerTestCase(BaseTestCase):
 
         # assert
         self.assertEqual(res.status_code, 200)
-        self.assertEqual(image.format(), data.get('image'))
+        self.assertEqual(self.as_json(image.format()), data.get('image'))
 
     # Create Image ------------------------------------------------
     def test_cannot_create_image_without_correct_permission(self):
@@ -320,9 +323,13 @@ class ImageManagerTestCase(BaseTestCase):
             + '?mock_token_verification=True&permission=update:posts',
             json=data
         )
+        data = json.loads(res.data)
 
         # assert
-        self.assertEqual(res.status_code, 404)
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(data.get('errors'), {
+            'image_ids': {'missing': [], 'foreign': [image1.id, image2.id]}
+        })
 
     def test_can_add_own_images_to_post(self):
         # given
@@ -346,8 +353,39 @@ class ImageManagerTestCase(BaseTestCase):
         # assert
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data.get('success'), True)
-        self.assertEqual(data.get('post').get('images')[0], image1.format())
-        self.assertEqual(data.get('post').get('images')[1], image2.format())
+        self.assertEqual(
+            data.get('post').get('images')[0], self.as_json(image1.format()))
+        self.assertEqual(
+            data.get('post').get('images')[1], self.as_json(image2.format()))
+
+    def test_added_images_keep_requested_order(self):
+        # given
+        post = generate_post(user_id=test_user_id)
+        image_ids = [
+            generate_image(user_id=test_user_id).id for i in range(0, 3)
+        ]
+        image_ids = [image_ids[2], image_ids[0], image_ids[1]]
+
+        # make request
+        res = self.client().post(
+            api_base
+            + '/posts/' + str(post.id) + '/images'
+            + '?mock_token_verification=True&permission=update:posts',
+            json={"image_ids": image_ids}
+        )
+        data = json.loads(res.data)
+        positions = db.session.execute(
+            select([post_image.c.image_id])
+            .where(post_image.c.post_id == post.id)
+            .order_by(post_image.c.position)
+        ).fetchall()
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            [image['id'] for image in data.get('post').get('images')],
+            image_ids)
+        self.assertEqual([row[0] for row in positions], image_ids)
 
     def test_deleting_post_should_delete_images_as_well(self):
         # given
@@ -1,10 +1,13 @@
 from unittest import main
 
-from flask import json
+from flask import json, g
 
+from limbook_api.v1.comments import generate_comment, Comment
 from limbook_api.v1.image_manager import generate_image, Image
-from limbook_api.v1.posts import generate_post
-from tests.base import BaseTestCase, test_user_id, api_base
+from limbook_api.v1.posts import generate_post, Post, \
+    get_images_list_using_ids
+from limbook_api.v1.reacts import generate_react, React
+from tests.base import BaseTestCase, test_user_id, api_base, QueryCounter
 
 
 class PostsTestCase(BaseTestCase):
@@ -40,6 +43,412 @@ class PostsTestCase(BaseTestCase):
         self.assertEqual(data.get('total'), 25)
         self.assertEqual(len(data.get('query_args')), 3)
 
+    def test_get_posts_query_count_does_not_grow_with_page_size(self):
+        # given
+        for i in range(0, 20):
+            post = generate_post(images=[generate_image()])
+            generate_react(post_id=post.id)
+            generate_comment(post_id=post.id)
+
+        def count_queries(per_page):
+            with QueryCounter() as counter:
+                res = self.client().get(
+                    api_base
+                    + '/posts'
+                    + '?mock_token_verification=True&permission=read:posts'
+                    + '&per_page=' + str(per_page)
+                )
+            self.assertEqual(len(json.loads(res.data).get('posts')), per_page)
+            return counter.count
+
+        # assert
+        self.assertEqual(count_queries(2), count_queries(20))
+
+    def test_get_posts_returns_summaries(self):
+        # given
+        post = generate_post()
+        for i in range(0, 5):
+            generate_react(post_id=post.id)
+            generate_comment(post_id=post.id)
+        generate_react(user_id=test_user_id, post_id=post.id)
+        generate_post()
+
+        # make request
+        res = self.client().get(
+            api_base
+            + '/posts'
+            + '?mock_token_verification=True&permission=read:posts'
+        )
+        data = json.loads(res.data)
+        summary, other = data.get('posts')
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(summary.get('react_count'), 6)
+        self.assertEqual(summary.get('comment_count'), 5)
+        self.assertTrue(summary.get('reacted'))
+        self.assertEqual(len(summary.get('comments')), 3)
+        self.assertNotIn('reacts', summary)
+        self.assertEqual(other.get('react_count'), 0)
+        self.assertEqual(other.get('comment_count'), 0)
+        self.assertFalse(other.get('reacted'))
+        self.assertEqual(other.get('comments'), [])
+
+    def test_can_include_full_reacts_and_comments_in_posts(self):
+        # given
+        post = generate_post()
+        for i in range(0, 5):
+            generate_react(post_id=post.id)
+            generate_comment(post_id=post.id)
+
+        # make request
+        res = self.client().get(
+            api_base
+            + '/posts'
+            + '?mock_token_verification=True&permission=read:posts'
+            + '&include=reacts,comments'
+        )
+        data = json.loads(res.data)
+        summary = data.get('posts')[0]
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(summary.get('reacts')), 5)
+        self.assertEqual(len(summary.get('comments')), 5)
+        self.assertEqual(summary.get('comment_count'), 5)
+
+    def test_get_posts_with_fields_skips_unrequested_relations(self):
+        # given
+        for i in range(0, 5):
+            post = generate_post(images=[generate_image()])
+            generate_react(post_id=post.id)
+            generate_comment(post_id=post.id)
+
+        def get_posts(query_string):
+            with QueryCounter() as counter:
+                res = self.client().get(
+                    api_base
+                    + '/posts'
+                    + '?mock_token_verification=True&permission=read:posts'
+                    + query_string
+                )
+            return json.loads(res.data).get('posts'), counter.count
+
+        posts, all_fields_count = get_posts('')
+        sparse_posts, sparse_count = get_posts('&fields=id,content')
+
+        # assert
+        self.assertEqual(len(sparse_posts), 5)
+        self.assertEqual(sorted(sparse_posts[0].keys()), ['content', 'id'])
+        self.assertLess(sparse_count, all_fields_count)
+
+    def test_get_posts_with_fields_loads_only_their_columns(self):
+        # given
+        generate_post()
+
+        # make request
+        with QueryCounter() as counter:
+            res = self.client().get(
+                api_base
+                + '/posts'
+                + '?mock_token_verification=True&permission=read:posts'
+                + '&fields=id,content'
+            )
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        reloads = [
+            statement for statement in counter.statements
+            if 'WHERE post.id IN' in statement
+        ]
+        self.assertTrue(reloads)
+        for statement in reloads:
+            self.assertIn('post.content', statement)
+            self.assertNotIn('post.user_id', statement)
+
+    def test_can_page_through_posts_with_cursors(self):
+        # given
+        for i in range(0, 25):
+            generate_post()
+
+        def get_posts(query_string):
+            res = self.client().get(
+                api_base
+                + '/posts'
+                + '?mock_token_verification=True&permission=read:posts'
+                + query_string
+            )
+            self.assertEqual(res.status_code, 200)
+            return json.loads(res.data)
+
+        # walk forward, inserting a post after each page
+        ids = []
+        data = get_posts('')
+        while True:
+            ids += [post.get('id') for post in data.get('posts')]
+            generate_post()
+            if not data.get('next_cursor'):
+                break
+            data = get_posts('&after=' + data.get('next_cursor'))
+
+        # walk back from the last page
+        previous = get_posts('&before=' + data.get('prev_cursor'))
+
+        # assert
+        self.assertEqual(ids, list(range(1, len(ids) + 1)))
+        self.assertGreaterEqual(len(ids), 25)
+        self.assertEqual(
+            [post.get('id') for post in previous.get('posts')],
+            ids[-len(data.get('posts')) - 10:-len(data.get('posts'))]
+        )
+
+    def test_get_posts_total_takes_no_extra_query(self):
+        # given
+        for i in range(0, 25):
+            generate_post()
+
+        def get_posts(query_string):
+            with QueryCounter() as counter:
+                res = self.client().get(
+                    api_base
+                    + '/posts'
+                    + '?mock_token_verification=True&permission=read:posts'
+                    + query_string
+                )
+            return json.loads(res.data).get('total'), counter.count
+
+        # format the page once, so both requests below hit the fragment cache
+        estimate, _ = get_posts('&total=estimate')
+        total, count = get_posts('&total=exact')
+        no_total, no_total_count = get_posts('&total=none')
+        first_page = self.client().get(
+            api_base
+            + '/posts'
+            + '?mock_token_verification=True&permission=read:posts'
+        )
+        cursor_total, _ = get_posts(
+            '&after=' + json.loads(first_page.data).get('next_cursor'))
+        past_end_total, _ = get_posts('&page=5')
+
+        # assert
+        self.assertEqual(total, 25)
+        self.assertIsNone(no_total)
+        self.assertEqual(count, no_total_count)
+        # sqlite keeps no planner statistics
+        self.assertEqual(estimate, 25)
+        self.assertEqual(cursor_total, 25)
+        self.assertEqual(past_end_total, 25)
+
+    def test_get_posts_formats_post_again_after_child_write(self):
+        # given
+        post = generate_post()
+
+        def get_comment_count():
+            res = self.client().get(
+                api_base
+                + '/posts'
+                + '?mock_token_verification=True&permission=read:posts'
+            )
+            return json.loads(res.data).get('posts')[0].get('comment_count')
+
+        # make request
+        before = get_comment_count()
+        res = self.client().post(
+            api_base
+            + '/comments'
+            + '?mock_token_verification=True&permission=create:comments',
+            json={'content': 'New comment', 'post_id': post.id}
+        )
+        after = get_comment_count()
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertGreater(Post.query.get(post.id).version, 1)
+        self.assertEqual(before, 0)
+        self.assertEqual(after, 1)
+
+    def test_can_search_posts(self):
+        # given
+        generate_post(content='Sunset over the Himalayas')
+        generate_post(content='Breakfast')
+
+        # make request
+        res = self.client().get(
+            api_base
+            + '/posts'
+            + '?mock_token_verification=True&permission=read:posts'
+            + '&search_term=himalayas'
+        )
+        data = json.loads(res.data)
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data.get('total'), 1)
+        self.assertEqual(
+            data.get('posts')[0].get('content'), 'Sunset over the Himalayas')
+
+    def test_cannot_get_posts_with_invalid_cursor(self):
+        # make request
+        res = self.client().get(
+            api_base
+            + '/posts'
+            + '?mock_token_verification=True&permission=read:posts'
+            + '&after=not-a-cursor'
+        )
+
+        # assert
+        self.assertEqual(res.status_code, 400)
+
+    def test_get_posts_answers_not_modified_for_matching_etag(self):
+        # given
+        for i in range(0, 5):
+            generate_post()
+        url = api_base \
+            + '/posts' \
+            + '?mock_token_verification=True&permission=read:posts'
+        etag = self.client().get(url).headers.get('ETag')
+
+        # make request
+        with QueryCounter() as counter:
+            res = self.client().get(url, headers={'If-None-Match': etag})
+        generate_post()
+        changed = self.client().get(url, headers={'If-None-Match': etag})
+
+        # assert
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b'')
+        self.assertEqual(counter.count, 1)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers.get('ETag'), etag)
+        self.assertEqual(len(json.loads(changed.data).get('posts')), 6)
+
+    def test_etag_changes_with_update_in_the_same_second(self):
+        # given
+        post_id = generate_post(user_id=test_user_id).id
+        urls = [
+            api_base + path
+            + '?mock_token_verification=True&permission=read:posts'
+            for path in ['/posts', '/posts/' + str(post_id)]
+        ]
+        etags = [self.client().get(url).headers.get('ETag') for url in urls]
+
+        # update within the second the etags were made in
+        self.client().patch(
+            api_base
+            + '/posts/' + str(post_id)
+            + '?mock_token_verification=True&permission=update:posts',
+            json={'content': 'Updated'}
+        )
+        responses = [
+            self.client().get(url, headers={'If-None-Match': etag})
+            for url, etag in zip(urls, etags)
+        ]
+
+        # assert
+        for res, etag in zip(responses, etags):
+            self.assertEqual(res.status_code, 200)
+            self.assertNotEqual(res.headers.get('ETag'), etag)
+            self.assertIn(b'Updated', res.data)
+
+    # Autocomplete ----------------------------------------
+    def test_can_autocomplete_posts(self):
+        # given
+        ids = []
+        for content in ['Sunset over the Himalayas', 'Hiking in the hills',
+                        'Himalayan salt']:
+            res = self.client().post(
+                api_base
+                + '/posts?mock_token_verification=True'
+                + '&permission=create:posts',
+                json={'content': content}
+            )
+            ids.append(json.loads(res.data).get('post').get('id'))
+
+        # make request
+        with QueryCounter() as counter:
+            res = self.client().get(
+                api_base
+                + '/posts/autocomplete'
+                + '?mock_token_verification=True&permission=read:posts'
+                + '&search_term=sunset him'
+            )
+        data = json.loads(res.data)
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(counter.count, 0)
+        self.assertEqual(data.get('terms'), ['himalayan', 'himalayas'])
+        self.assertEqual(data.get('post_ids'), [ids[2], ids[0]])
+
+    def test_autocomplete_follows_updated_and_deleted_posts(self):
+        # given
+        post = generate_post(user_id=test_user_id)
+
+        def autocomplete(search_term):
+            res = self.client().get(
+                api_base
+                + '/posts/autocomplete'
+                + '?mock_token_verification=True&permission=read:posts'
+                + '&search_term=' + search_term
+            )
+            return json.loads(res.data).get('terms')
+
+        self.client().patch(
+            api_base + '/posts/' + str(post.id)
+            + '?mock_token_verification=True&permission=update:posts',
+            json={'content': 'Monsoon rain'}
+        )
+        after_update = autocomplete('mon')
+        self.client().delete(
+            api_base + '/posts/' + str(post.id)
+            + '?mock_token_verification=True&permission=delete:posts'
+        )
+
+        # assert
+        self.assertEqual(after_update, ['monsoon'])
+        self.assertEqual(autocomplete('mon'), [])
+
+    def test_autocomplete_limit_is_at_least_one(self):
+        # given
+        for content in ['Monsoon rain', 'Monday']:
+            generate_post(content=content)
+        self.app.test_cli_runner().invoke(args=['rebuild-autocomplete'])
+
+        for limit in ['0', '-5']:
+            # make request
+            res = self.client().get(
+                api_base
+                + '/posts/autocomplete'
+                + '?mock_token_verification=True&permission=read:posts'
+                + '&search_term=mon&limit=' + limit
+            )
+            data = json.loads(res.data)
+
+            # assert
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(len(data.get('terms')), 1)
+            self.assertEqual(len(data.get('post_ids')), 1)
+
+    def test_rebuild_autocomplete_indexes_existing_posts(self):
+        # given
+        post = generate_post(content='Sunset over the Himalayas')
+
+        # rebuild
+        result = self.app.test_cli_runner().invoke(
+            args=['rebuild-autocomplete'])
+        res = self.client().get(
+            api_base
+            + '/posts/autocomplete'
+            + '?mock_token_verification=True&permission=read:posts'
+            + '&search_term=him'
+        )
+        data = json.loads(res.data)
+
+        # assert
+        self.assertIn('Indexed 1 posts', result.output)
+        self.assertEqual(data.get('terms'), ['himalayas'])
+        self.assertEqual(data.get('post_ids'), [post.id])
+
     # Get Post ----------------------------------------
     def test_cannot_get_post_without_correct_permission(self):
         # get posts
@@ -66,6 +475,23 @@ class PostsTestCase(BaseTestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data.get('post').get('id'), 1)
 
+    def test_can_get_post_with_fields(self):
+        # given
+        generate_post(user_id=test_user_id)
+
+        # make request
+        res = self.client().get(
+            api_base
+            + '/posts/1'
+            + '?mock_token_verification=True&permission=read:posts'
+            + '&fields=id,images'
+        )
+        data = json.loads(res.data)
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data.get('post'), {'id': 1, 'images': []})
+
     # Create Posts ---------------------------------------
     def test_cannot_create_posts_without_correct_permission(self):
         # create post
@@ -123,6 +549,183 @@ class PostsTestCase(BaseTestCase):
         self.assertEqual(
             len(data.get('post').get('images')), 2)
 
+    def test_images_are_loaded_in_requested_order(self):
+        # given
+        image_ids = [
+            generate_image(user_id=test_user_id).id for i in range(0, 3)
+        ]
+        requested = [image_ids[2], image_ids[0], image_ids[2], image_ids[1]]
+
+        # load images
+        with self.app.test_request_context():
+            g.auth_payload = {'sub': test_user_id}
+            with QueryCounter() as counter:
+                images = get_images_list_using_ids(requested)
+
+        # assert
+        self.assertEqual(
+            [image.id for image in images],
+            [image_ids[2], image_ids[0], image_ids[1]])
+        self.assertEqual(counter.count, 1)
+
+    def test_post_images_keep_requested_order(self):
+        # given
+        image_ids = [
+            generate_image(user_id=test_user_id).id for i in range(0, 3)
+        ]
+
+        # make request
+        res = self.client().post(
+            api_base
+            + '/posts?mock_token_verification=True&permission=create:posts',
+            json={'content': 'My new Post', 'image_ids': image_ids[::-1]}
+        )
+        post_id = json.loads(res.data).get('post').get('id')
+        created = json.loads(res.data).get('post').get('images')
+
+        # reorder images
+        res = self.client().patch(
+            api_base
+            + '/posts/' + str(post_id)
+            + '?mock_token_verification=True&permission=update:posts',
+            json={'image_ids': [image_ids[1], image_ids[2], image_ids[0]]}
+        )
+        updated = json.loads(res.data).get('post').get('images')
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            [image['id'] for image in created], image_ids[::-1])
+        self.assertEqual(
+            [image['id'] for image in updated],
+            [image_ids[1], image_ids[2], image_ids[0]])
+
+    def test_cannot_create_post_with_invalid_image_ids(self):
+        # given
+        generate_image(user_id=test_user_id)
+
+        for image_ids in [5, [[1]], [True], ['1'], {'id': 1}]:
+            # make request
+            res = self.client().post(
+                api_base
+                + '/posts?mock_token_verification=True'
+                + '&permission=create:posts',
+                json={'content': 'My new Post', 'image_ids': image_ids}
+            )
+            data = json.loads(res.data)
+
+            # assert
+            self.assertEqual(res.status_code, 422)
+            self.assertIn('image_ids', data.get('errors'))
+
+        self.assertEqual(Post.query.count(), 0)
+
+    def test_cannot_create_post_with_missing_or_foreign_images(self):
+        # given
+        image = generate_image(user_id=test_user_id)
+        other_image = generate_image(user_id='auth0|other_user_id')
+        post = {
+            "content": "My new Post",
+            "image_ids": [image.id, 100, other_image.id]
+        }
+
+        # make request
+        res = self.client().post(
+            api_base
+            + '/posts?mock_token_verification=True&permission=create:posts',
+            json=post
+        )
+        data = json.loads(res.data)
+
+        # assert
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(data.get('error_code'), 'validation_error')
+        self.assertEqual(data.get('errors'), {
+            'image_ids': {'missing': [100], 'foreign': [other_image.id]}
+        })
+        self.assertEqual(Post.query.count(), 0)
+
+    def test_can_bulk_create_posts(self):
+        # given
+        image_id = generate_image(user_id=test_user_id).id
+        posts = [
+            {"content": "First Post"},
+            {"content": ""},
+            "Not a post",
+            {"content": "Post with images", "image_ids": [image_id]},
+            {"content": "Second Post"}
+        ]
+
+        # make request
+        res = self.client().post(
+            api_base
+            + '/posts/bulk'
+            + '?mock_token_verification=True&permission=create:posts',
+            json={'posts': posts}
+        )
+        data = json.loads(res.data)
+        results = data.get('results')
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data.get('created'), 2)
+        self.assertEqual(
+            results[0].get('post').get('content'), 'First Post')
+        self.assertEqual(results[1].get('error'), 422)
+        self.assertEqual(results[2].get('error'), 422)
+        self.assertEqual(results[3].get('error'), 422)
+        self.assertEqual(
+            results[4].get('post').get('content'), 'Second Post')
+        self.assertEqual(
+            results[4].get('post').get('user_id'), test_user_id)
+        self.assertEqual(Post.query.count(), 2)
+
+    def test_bulk_created_posts_count_against_rate_limit(self):
+        # given
+        self.app.config['RATE_LIMITS'] = {
+            'default': (60, 10),
+            'create:posts': (3, 0.01)
+        }
+        posts = [{"content": "Post"} for i in range(0, 5)]
+
+        # make request
+        res = self.client().post(
+            api_base
+            + '/posts/bulk'
+            + '?mock_token_verification=True&permission=create:posts',
+            json={'posts': posts}
+        )
+        data = json.loads(res.data)
+        results = data.get('results')
+
+        # assert
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data.get('created'), 3)
+        self.assertEqual(results[3].get('error'), 429)
+        self.assertEqual(results[4].get('error'), 429)
+        self.assertEqual(Post.query.count(), 3)
+
+        # the bulk request used up the limit of single creates too
+        res = self.client().post(
+            api_base
+            + '/posts'
+            + '?mock_token_verification=True&permission=create:posts',
+            json={"content": "My new Post"}
+        )
+        self.assertEqual(res.status_code, 429)
+
+    def test_cannot_bulk_create_posts_without_list(self):
+        # make request
+        res = self.client().post(
+            api_base
+            + '/posts/bulk'
+            + '?mock_token_verification=True&permission=create:posts',
+            json={'posts': {"content": "My new Post"}}
+        )
+
+        # assert
+        self.assertEqual(res.status_code, 422)
+
     # Update Posts ---------------------------------------
     def test_cannot_update_posts_without_correct_permission(self):
         # update post
@@ -226,6 +829,39 @@ class PostsTestCase(BaseTestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data.get('deleted_id'), post.id)
 
+    def test_deleting_post_deletes_its_rows_with_constant_queries(self):
+        def delete_post_with(size):
+            post = generate_post(
+                user_id=test_user_id,
+                images=[generate_image() for i in range(0, size)]
+            )
+            post_id = post.id
+            for i in range(0, size):
+                generate_react(post_id=post_id)
+                generate_comment(post_id=post_id)
+
+            with QueryCounter() as counter:
+                res = self.client().delete(
+                    api_base
+                    + '/posts/' + str(post_id)
+                    + '?mock_token_verification=True'
+                    + '&permission=delete:posts'
+                )
+            return res, counter.count
+
+        # make request
+        small_res, small_count = delete_post_with(1)
+        large_res, large_count = delete_post_with(5)
+
+        # assert
+        self.assertEqual(small_res.status_code, 200)
+        self.assertEqual(large_res.status_code, 200)
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(Post.query.count(), 0)
+        self.assertEqual(Comment.query.count(), 0)
+        self.assertEqual(React.query.count(), 0)
+        self.assertEqual(Image.query.count(), 0)
+
 
 # Make the tests conveniently executable
 if __name__ == "__main__":
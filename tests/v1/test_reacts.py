@@ -47,6 +47,7 @@ class ReactsTestCase(BaseTestCase):
         # assert
         self.assertEqual(res.status_code, 200)
         self.assertEqual(len(data.get('post').get('reacts')), 1)
+        self.assertEqual(data.get('post').get('react_count'), 1)
 
         # unreact post
         res = self.client().post(
@@ -59,6 +60,18 @@ class ReactsTestCase(BaseTestCase):
         # assert
         self.assertEqual(res.status_code, 200)
         self.assertEqual(len(data.get('post').get('reacts')), 0)
+        self.assertEqual(data.get('post').get('react_count'), 0)
+
+    def test_cannot_react_missing_post(self):
+        # react post
+        res = self.client().post(
+            api_base
+            + '/posts/1000/reacts/toggle'
+            + '?mock_token_verification=True&permission=update:reacts'
+        )
+
+        # assert
+        self.assertEqual(res.status_code, 404)
 
 
 # Make the tests conveniently executable
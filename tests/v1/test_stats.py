@@ -34,6 +34,31 @@ class StatsTestCase(BaseTestCase):
         self.assertEqual(res.status_code, 200)
         self.assertTrue(data.get('stats'))
 
+    def test_requests_over_rate_limit_are_rejected(self):
+        # given
+        self.app.config['RATE_LIMITS'] = {
+            'default': (60, 10),
+            'read:stats': (2, 0.5)
+        }
+        url = api_base + '/stats?mock_token_verification=True' \
+                         '&permission=read:stats'
+
+        # make requests
+        responses = [self.client().get(url) for i in range(0, 3)]
+        data = json.loads(responses[2].data)
+
+        # assert
+        self.assertEqual(responses[1].status_code, 200)
+        self.assertEqual(responses[2].status_code, 429)
+        self.assertEqual(data.get('error_code'), 'too_many_requests')
+        self.assertEqual(responses[2].headers.get('Retry-After'), '2')
+
+        # other permissions have their own bucket
+        res = self.client().get(
+            api_base + '/secure-route?mock_token_verification=True'
+            + '&permission=read:secure_route')
+        self.assertEqual(res.status_code, 200)
+
 
 # Make the tests conveniently executable
 if __name__ == "__main__":